@@ -0,0 +1,30 @@
+"""Add cluster id to blog articles
+
+Revision ID: 8b1f4c2a9d3e
+Revises: 2d8e2957c133
+Create Date: 2026-10-19 14:05:12.417238
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1f4c2a9d3e'
+down_revision: Union[str, None] = '2d8e2957c133'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('blog_articles', sa.Column('cluster_id', sa.String(length=40), nullable=True))
+    op.create_index('ix_blog_articles_cluster_id', 'blog_articles', ['cluster_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_blog_articles_cluster_id', table_name='blog_articles')
+    op.drop_column('blog_articles', 'cluster_id')
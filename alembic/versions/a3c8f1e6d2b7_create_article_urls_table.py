@@ -0,0 +1,67 @@
+"""Keep article URLs unique across partitions
+
+Revision ID: a3c8f1e6d2b7
+Revises: f7b3d9e2a5c4
+Create Date: 2026-10-21 15:06:44.128390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8f1e6d2b7'
+down_revision: Union[str, None] = 'f7b3d9e2a5c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A unique constraint of the partitioned blog_articles has to include the
+    # date, so the URLs are kept unique in this non-partitioned table
+    op.create_table('article_urls',
+    sa.Column('url', sa.String(length=1000), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('url')
+    )
+
+    # Articles loaded again under another date are reduced to the newest
+    op.execute("""
+        DELETE FROM blog_articles a
+        USING blog_articles newer
+        WHERE newer.url = a.url AND (newer.date, newer.id) > (a.date, a.id)
+    """)
+    op.execute("INSERT INTO article_urls (url, article_id, date) SELECT url, id, date FROM blog_articles")
+
+    # Inserting an article with a URL that is already taken fails like with a
+    # unique constraint. Moving an article to another partition may run as a
+    # delete and an insert, which the trigger sees in that order.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION track_article_url() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM article_urls WHERE url = OLD.url AND article_id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO article_urls (url, article_id, date) VALUES (NEW.url, NEW.id, NEW.date);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER blog_articles_track_url
+        AFTER INSERT OR UPDATE OF url, date OR DELETE ON blog_articles
+        FOR EACH ROW EXECUTE FUNCTION track_article_url()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS blog_articles_track_url ON blog_articles")
+    op.execute("DROP FUNCTION IF EXISTS track_article_url()")
+    op.drop_table('article_urls')
@@ -0,0 +1,156 @@
+"""Partition blog articles by season
+
+Revision ID: a7c5e2f8d913
+Revises: f3a9c2d71b58
+Create Date: 2026-10-19 18:40:12.583091
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c5e2f8d913'
+down_revision: Union[str, None] = 'f3a9c2d71b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, title, url, date, content, summary, content_embedding, summary_embedding, cluster_id, "
+    "embedding_version, content_hash, content_embedding_next, summary_embedding_next, "
+    "embedding_version_next, content_hash_next"
+)
+
+
+def season_of(day) -> int:
+    """Return the year a season (1 July to 30 June) starts in."""
+    return day.year if day.month >= 7 else day.year - 1
+
+
+def article_columns():
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('blog_articles_id_seq'::regclass)"), nullable=False),
+        sa.Column('title', sa.String(length=500), nullable=False),
+        sa.Column('url', sa.String(length=1000), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('content_embedding', Vector(1536), nullable=True),
+        sa.Column('summary_embedding', Vector(1536), nullable=True),
+        sa.Column('cluster_id', sa.String(length=40), nullable=True),
+        sa.Column('embedding_version', sa.String(length=100), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+        sa.Column('content_embedding_next', Vector(1536), nullable=True),
+        sa.Column('summary_embedding_next', Vector(1536), nullable=True),
+        sa.Column('embedding_version_next', sa.String(length=100), nullable=True),
+        sa.Column('content_hash_next', sa.String(length=64), nullable=True),
+    ]
+
+
+def create_change_triggers(table):
+    op.execute(f"""
+        CREATE TRIGGER {table}_changed
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_blog_articles_changed()
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A foreign key to a partitioned table has to include the partition key,
+    # so article_chunks loses its foreign key. Deleting an article still
+    # deletes its chunks, through a trigger.
+    op.drop_constraint('article_chunks_article_id_fkey', 'article_chunks', type_='foreignkey')
+    op.execute("DROP TRIGGER IF EXISTS blog_articles_changed ON blog_articles")
+    op.rename_table('blog_articles', 'blog_articles_unpartitioned')
+    op.execute("ALTER TABLE blog_articles_unpartitioned RENAME CONSTRAINT blog_articles_pkey TO blog_articles_unpartitioned_pkey")
+    # Keep the ID sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE blog_articles_id_seq OWNED BY NONE")
+
+    # The partition key has to be part of the primary key and unique constraints
+    op.create_table('blog_articles',
+    *article_columns(),
+    sa.PrimaryKeyConstraint('id', 'date', name='blog_articles_pkey'),
+    sa.UniqueConstraint('url', 'date', name='blog_articles_url_date_key'),
+    postgresql_partition_by='RANGE (date)'
+    )
+    op.execute("ALTER SEQUENCE blog_articles_id_seq OWNED BY blog_articles.id")
+
+    # Indexes on the partitioned table are created on every partition, and
+    # each partition's index can be rebuilt on its own
+    op.execute("DROP INDEX IF EXISTS ix_blog_articles_cluster_id")
+    op.create_index('ix_blog_articles_cluster_id', 'blog_articles', ['cluster_id'])
+    for column in ('content_embedding', 'summary_embedding'):
+        op.create_index(
+            f'ix_blog_articles_{column}', 'blog_articles', [column],
+            postgresql_using='hnsw',
+            postgresql_ops={column: 'vector_cosine_ops'}
+        )
+    op.execute("""
+        CREATE INDEX ix_blog_articles_fulltext ON blog_articles
+        USING gin (to_tsvector('german', title || ' ' || content))
+    """)
+
+    # One partition per season (1 July to 30 June) from the oldest article to
+    # the next season, and a default partition for anything outside
+    oldest = op.get_bind().execute(sa.text("SELECT min(date) FROM blog_articles_unpartitioned")).scalar()
+    current = season_of(date.today())
+    for year in range(season_of(oldest) if oldest else current, current + 2):
+        op.execute(f"""
+            CREATE TABLE blog_articles_{year}_{(year + 1) % 100:02d}
+            PARTITION OF blog_articles FOR VALUES FROM ('{year}-07-01') TO ('{year + 1}-07-01')
+        """)
+    op.execute("CREATE TABLE blog_articles_default PARTITION OF blog_articles DEFAULT")
+
+    op.execute(f"INSERT INTO blog_articles ({COLUMNS}) SELECT {COLUMNS} FROM blog_articles_unpartitioned")
+    op.drop_table('blog_articles_unpartitioned')
+
+    create_change_triggers('blog_articles')
+    op.execute("""
+        CREATE OR REPLACE FUNCTION delete_article_chunks() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM article_chunks WHERE article_id = OLD.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER blog_articles_delete_chunks
+        AFTER DELETE ON blog_articles
+        FOR EACH ROW EXECUTE FUNCTION delete_article_chunks()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS blog_articles_delete_chunks ON blog_articles")
+    op.execute("DROP FUNCTION IF EXISTS delete_article_chunks()")
+    op.execute("DROP TRIGGER IF EXISTS blog_articles_changed ON blog_articles")
+    op.rename_table('blog_articles', 'blog_articles_partitioned')
+    op.execute("ALTER TABLE blog_articles_partitioned RENAME CONSTRAINT blog_articles_pkey TO blog_articles_partitioned_pkey")
+    op.execute("ALTER SEQUENCE blog_articles_id_seq OWNED BY NONE")
+
+    op.create_table('blog_articles',
+    *article_columns(),
+    sa.PrimaryKeyConstraint('id', name='blog_articles_pkey'),
+    sa.UniqueConstraint('url', name='blog_articles_url_key')
+    )
+    op.execute("ALTER SEQUENCE blog_articles_id_seq OWNED BY blog_articles.id")
+    # Articles with the same URL in several seasons are reduced to the newest
+    op.execute(f"""
+        INSERT INTO blog_articles ({COLUMNS})
+        SELECT DISTINCT ON (url) {COLUMNS} FROM blog_articles_partitioned ORDER BY url, date DESC
+    """)
+    op.drop_table('blog_articles_partitioned')
+
+    op.create_index('ix_blog_articles_cluster_id', 'blog_articles', ['cluster_id'])
+    create_change_triggers('blog_articles')
+    op.execute("DELETE FROM article_chunks WHERE article_id NOT IN (SELECT id FROM blog_articles)")
+    op.create_foreign_key(
+        'article_chunks_article_id_fkey', 'article_chunks', 'blog_articles',
+        ['article_id'], ['id'], ondelete='CASCADE'
+    )
@@ -0,0 +1,47 @@
+"""Keep the chunks of articles moved between partitions
+
+Revision ID: b5d0e8c3f6a2
+Revises: a7c5e2f8d913
+Create Date: 2026-10-20 10:12:47.205318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d0e8c3f6a2'
+down_revision: Union[str, None] = 'a7c5e2f8d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Moving an article to another partition, e.g. by changing its date to
+    # another season, deletes the row from the old partition. AFTER triggers
+    # run at the end of the statement, when the moved row exists again.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION delete_article_chunks() RETURNS trigger AS $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM blog_articles WHERE id = OLD.id) THEN
+                DELETE FROM article_chunks WHERE article_id = OLD.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION delete_article_chunks() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM article_chunks WHERE article_id = OLD.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
@@ -0,0 +1,61 @@
+"""Add embedding versioning and backfill checkpoints
+
+Revision ID: c4e7a1d95f20
+Revises: 8b1f4c2a9d3e
+Create Date: 2026-10-19 15:12:40.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a1d95f20'
+down_revision: Union[str, None] = '8b1f4c2a9d3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('blog_articles', sa.Column('embedding_version', sa.String(length=100), nullable=True))
+    op.add_column('blog_articles', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('blog_articles', sa.Column('content_embedding_next', Vector(1536), nullable=True))
+    op.add_column('blog_articles', sa.Column('summary_embedding_next', Vector(1536), nullable=True))
+    op.add_column('blog_articles', sa.Column('embedding_version_next', sa.String(length=100), nullable=True))
+    op.add_column('blog_articles', sa.Column('content_hash_next', sa.String(length=64), nullable=True))
+    op.create_table('embedding_backfills',
+    sa.Column('target_version', sa.String(length=100), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('rows_embedded', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('target_version')
+    )
+
+    # All embeddings so far were created with text-embedding-3-small, so
+    # existing rows do not have to be re-embedded
+    op.execute("""
+        UPDATE blog_articles
+        SET embedding_version = 'text-embedding-3-small:1536'
+        WHERE content_embedding IS NOT NULL OR summary_embedding IS NOT NULL
+    """)
+    op.execute("""
+        UPDATE blog_articles
+        SET content_hash = encode(sha256(convert_to(content || E'\\n' || summary, 'UTF8')), 'hex')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('embedding_backfills')
+    op.drop_column('blog_articles', 'content_hash_next')
+    op.drop_column('blog_articles', 'embedding_version_next')
+    op.drop_column('blog_articles', 'summary_embedding_next')
+    op.drop_column('blog_articles', 'content_embedding_next')
+    op.drop_column('blog_articles', 'content_hash')
+    op.drop_column('blog_articles', 'embedding_version')
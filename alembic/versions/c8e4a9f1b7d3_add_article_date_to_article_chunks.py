@@ -0,0 +1,72 @@
+"""Add the article date to article chunks
+
+Revision ID: c8e4a9f1b7d3
+Revises: b5d0e8c3f6a2
+Create Date: 2026-10-20 11:03:19.648072
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e4a9f1b7d3'
+down_revision: Union[str, None] = 'b5d0e8c3f6a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Chunk searches restrict the dates in the nearest-neighbour query itself,
+    # without a join to blog_articles
+    op.add_column('article_chunks', sa.Column('article_date', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE article_chunks c SET article_date = a.date
+        FROM blog_articles a WHERE a.id = c.article_id
+    """)
+    op.execute("DELETE FROM article_chunks WHERE article_date IS NULL")
+    op.alter_column('article_chunks', 'article_date', nullable=False)
+    op.create_index('ix_article_chunks_article_date', 'article_chunks', ['article_date'])
+
+    # The copy is kept up to date by triggers, so inserts need not set it
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_chunk_article_date() RETURNS trigger AS $$
+        BEGIN
+            SELECT date INTO NEW.article_date FROM blog_articles WHERE id = NEW.article_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER article_chunks_set_article_date
+        BEFORE INSERT OR UPDATE OF article_id ON article_chunks
+        FOR EACH ROW EXECUTE FUNCTION set_chunk_article_date()
+    """)
+    # Moving an article to another season may run as a delete and an insert
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_chunk_article_dates() RETURNS trigger AS $$
+        BEGIN
+            UPDATE article_chunks SET article_date = NEW.date
+            WHERE article_id = NEW.id AND article_date IS DISTINCT FROM NEW.date;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER blog_articles_update_chunk_dates
+        AFTER INSERT OR UPDATE OF date ON blog_articles
+        FOR EACH ROW EXECUTE FUNCTION update_chunk_article_dates()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS blog_articles_update_chunk_dates ON blog_articles")
+    op.execute("DROP FUNCTION IF EXISTS update_chunk_article_dates()")
+    op.execute("DROP TRIGGER IF EXISTS article_chunks_set_article_date ON article_chunks")
+    op.execute("DROP FUNCTION IF EXISTS set_chunk_article_date()")
+    op.drop_index('ix_article_chunks_article_date', table_name='article_chunks')
+    op.drop_column('article_chunks', 'article_date')
@@ -0,0 +1,31 @@
+"""Add shadow embeddings to article chunks
+
+Revision ID: d2f6b8a4c1e9
+Revises: c8e4a9f1b7d3
+Create Date: 2026-10-21 09:14:36.502817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6b8a4c1e9'
+down_revision: Union[str, None] = 'c8e4a9f1b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('article_chunks', sa.Column('embedding_next', Vector(1536), nullable=True))
+    op.add_column('article_chunks', sa.Column('embedding_version_next', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('article_chunks', 'embedding_version_next')
+    op.drop_column('article_chunks', 'embedding_next')
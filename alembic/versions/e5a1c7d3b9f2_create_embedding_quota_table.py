@@ -0,0 +1,37 @@
+"""Create embedding quota table
+
+Revision ID: e5a1c7d3b9f2
+Revises: d2f6b8a4c1e9
+Create Date: 2026-10-21 10:27:51.913460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7d3b9f2'
+down_revision: Union[str, None] = 'd2f6b8a4c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Token buckets of the embedding quota shared by all processes, see
+    # rate_limit.SharedQuota
+    op.create_table('embedding_quota',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('requests', sa.Float(), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_interactive', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('embedding_quota')
@@ -0,0 +1,49 @@
+"""Create article chunks table
+
+Revision ID: e91d3b6f0a47
+Revises: c4e7a1d95f20
+Create Date: 2026-10-19 16:02:55.731904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91d3b6f0a47'
+down_revision: Union[str, None] = 'c4e7a1d95f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('article_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('token_count', sa.Integer(), nullable=False),
+    sa.Column('embedding', Vector(1536), nullable=True),
+    sa.Column('embedding_version', sa.String(length=100), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['blog_articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('article_id', 'chunk_index')
+    )
+    op.create_index('ix_article_chunks_article_id', 'article_chunks', ['article_id'])
+    # Approximate nearest neighbour index for cosine distance searches
+    op.create_index(
+        'ix_article_chunks_embedding', 'article_chunks', ['embedding'],
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_article_chunks_embedding', table_name='article_chunks')
+    op.drop_index('ix_article_chunks_article_id', table_name='article_chunks')
+    op.drop_table('article_chunks')
@@ -0,0 +1,45 @@
+"""Notify listeners when articles or chunks change
+
+Revision ID: f3a9c2d71b58
+Revises: e91d3b6f0a47
+Create Date: 2026-10-19 17:21:08.415276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d71b58'
+down_revision: Union[str, None] = 'e91d3b6f0a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The notification is sent when the transaction commits, and only once
+    # per transaction, so bulk inserts do not flood the listeners
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_blog_articles_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('blog_articles_changed', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ('blog_articles', 'article_chunks'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_changed
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_blog_articles_changed()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('blog_articles', 'article_chunks'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_changed ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_blog_articles_changed()")
@@ -0,0 +1,60 @@
+"""Create search cache table
+
+Revision ID: f7b3d9e2a5c4
+Revises: e5a1c7d3b9f2
+Create Date: 2026-10-21 13:42:08.371925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b3d9e2a5c4'
+down_revision: Union[str, None] = 'e5a1c7d3b9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Search results shared by all processes, see search_cache.SharedResultCache
+    op.create_table('search_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(length=200), nullable=False),
+    sa.Column('result_limit', sa.Integer(), nullable=False),
+    sa.Column('embedding', Vector(1536), nullable=False),
+    sa.Column('results', postgresql.JSONB(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('clock_timestamp()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_search_cache_created_at', 'search_cache', ['created_at'])
+
+    # Cached results are dropped together with the listeners' caches
+    op.execute("""
+        CREATE OR REPLACE FUNCTION clear_search_cache() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM search_cache;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ('blog_articles', 'article_chunks'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_clear_search_cache
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION clear_search_cache()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('blog_articles', 'article_chunks'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_clear_search_cache ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS clear_search_cache()")
+    op.drop_index('ix_search_cache_created_at', table_name='search_cache')
+    op.drop_table('search_cache')
@@ -0,0 +1,211 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+from typing import AsyncIterator, Callable, Dict, List
+from dotenv import load_dotenv
+from embedding_model import get_embeddings
+from chunking import count_tokens
+from rate_limit import INTERACTIVE
+from get_entry import search_similar_articles_async, search_similar_chunks_async
+from models.database import AsyncSessionLocal
+
+# Chat model used for answers, unless LLM_MODEL is set
+DEFAULT_LLM_MODEL = "gpt-4o-mini"
+
+# Hard limit of prompt tokens (instructions, question and retrieved passages)
+CONTEXT_TOKENS = 3000
+
+# Maximum number of tokens generated per answer
+ANSWER_TOKENS = 512
+
+# Number of articles retrieved per question
+TOP_K = 5
+
+SYSTEM_PROMPT = (
+    "You answer questions about VfB Stuttgart using only the numbered articles "
+    "from the club's blog given by the user. Answer in the language of the "
+    "question and cite the articles you use like [1]. If the articles do not "
+    "contain the answer, say so."
+)
+
+class OpenAIChatLLM:
+    """Stream answers from an OpenAI chat model."""
+
+    def __init__(self, model=None, max_tokens=ANSWER_TOKENS):
+        from langchain_openai import ChatOpenAI
+
+        self.chat = ChatOpenAI(
+            model=model or os.getenv("LLM_MODEL", DEFAULT_LLM_MODEL),
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            max_tokens=max_tokens,
+            streaming=True
+        )
+
+    async def stream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self.chat.astream([("system", system), ("human", prompt)]):
+            if chunk.content:
+                yield chunk.content
+
+class StubLLM:
+    """Answer with the first sentences of the first passage, without any API calls.
+
+    Words are streamed with a fixed delay, so that the streaming and timing
+    code can be run locally.
+    """
+
+    def __init__(self, model=None, max_tokens=ANSWER_TOKENS, delay=0.02):
+        self.max_tokens = max_tokens
+        self.delay = delay
+
+    async def stream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        passage = re.search(r"^\[1\][^\n]*\n(.+?)(?:\n\n\[\d+\]|\Z)", prompt, re.S | re.M)
+        text = " ".join(re.split(r"(?<=[.!?])\s+", passage.group(1))[:3]) + " [1]" if passage else "The articles do not contain the answer."
+        for index, word in enumerate(text.split(" ")[:self.max_tokens]):
+            await asyncio.sleep(self.delay)
+            yield word if index == 0 else " " + word
+
+LLM_BACKENDS = {
+    "openai": OpenAIChatLLM,
+    "stub": StubLLM,
+}
+
+def get_llm(backend=None, model=None, max_tokens=ANSWER_TOKENS):
+    """Create the LLM backend named by backend or LLM_BACKEND (default: openai)."""
+    backend = backend or os.getenv("LLM_BACKEND", "openai")
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {', '.join(LLM_BACKENDS)}")
+    return LLM_BACKENDS[backend](model=model, max_tokens=max_tokens)
+
+def article_passages(results, use_chunks: bool) -> List[Dict]:
+    """Turn search results into passages (title, date, url, text), best first."""
+    if use_chunks:
+        return [{
+            "title": match["title"],
+            "date": match["date"],
+            "url": match["url"],
+            # Keep the chunks in article order, so that the passage reads naturally
+            "text": "\n\n".join(chunk["content"] for chunk in sorted(match["chunks"], key=lambda c: c["chunk_index"])),
+        } for match in results]
+    return [{"title": result.title, "date": result.date, "url": result.url, "text": result.content} for result in results]
+
+def pack_context(question: str, passages: List[Dict], budget: int = CONTEXT_TOKENS):
+    """Build the prompt from as many passages as fit into the token budget.
+
+    Paragraphs already in the prompt are left out of later passages, which
+    removes the overlap between neighbouring chunks and text shared by
+    similar articles. A passage that does not fit is cut at a paragraph
+    boundary, and passages are dropped once nothing fits any more.
+    Returns the prompt, its token count (including the system prompt) and the
+    included passages.
+    """
+    header = f"Question: {question}\n\nArticles:"
+    used = count_tokens(SYSTEM_PROMPT) + count_tokens(header)
+    seen = set()
+    blocks = []
+    included = []
+
+    for passage in passages:
+        title = f"[{len(included) + 1}] {passage['title']} ({passage['date']:%d.%m.%Y}, {passage['url']})"
+        remaining = budget - used - count_tokens(title) - 2
+        paragraphs = []
+        for paragraph in passage["text"].split("\n\n"):
+            key = " ".join(paragraph.split()).lower()
+            if not key or key in seen:
+                continue
+            tokens = count_tokens(paragraph) + 1
+            if tokens > remaining:
+                break
+            paragraphs.append(paragraph)
+            seen.add(key)
+            remaining -= tokens
+        if not paragraphs:
+            continue
+
+        block = title + "\n" + "\n\n".join(paragraphs)
+        blocks.append(block)
+        included.append(passage)
+        used += count_tokens(block) + 2
+
+    # Tokens may merge across the joined blocks, so the budget is checked on
+    # the whole prompt as well
+    while True:
+        prompt = header + "\n\n" + "\n\n".join(blocks)
+        tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt)
+        if tokens <= budget or not blocks:
+            return prompt, tokens, included
+        blocks.pop()
+        included.pop()
+
+async def answer_question(question: str, on_token: Callable[[str], None], k: int = TOP_K,
+                          use_chunks: bool = True, budget: int = CONTEXT_TOKENS,
+                          llm=None, embeddings=None) -> Dict:
+    """Retrieve articles for a question and stream the generated answer to on_token.
+
+    Returns the timings of the request (retrieval, time to first token and
+    total, in seconds), the number of context tokens and the cited sources.
+    """
+    started = time.monotonic()
+    llm = llm or get_llm()
+    embeddings = embeddings or get_embeddings(priority=INTERACTIVE)
+
+    query_embedding = await embeddings.aembed_query(question)
+    async with AsyncSessionLocal() as db:
+        if use_chunks:
+            results = await search_similar_chunks_async(db, query_embedding, limit=k)
+        else:
+            results = await search_similar_articles_async(db, query_embedding, limit=k)
+    prompt, context_tokens, sources = pack_context(question, article_passages(results, use_chunks), budget)
+    retrieved = time.monotonic()
+
+    first_token = None
+    async for token in llm.stream(SYSTEM_PROMPT, prompt):
+        if first_token is None:
+            first_token = time.monotonic()
+        on_token(token)
+    finished = time.monotonic()
+
+    return {
+        "retrieval": retrieved - started,
+        "ttft": (first_token or finished) - started,
+        "total": finished - started,
+        "context_tokens": context_tokens,
+        "sources": [(source["title"], source["url"]) for source in sources],
+    }
+
+def write_token(token: str) -> None:
+    sys.stdout.write(token)
+    sys.stdout.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a question from the blog articles, streaming the answer.")
+    parser.add_argument("question", nargs="?", help="Question to answer (asked interactively if missing)")
+    parser.add_argument("-k", type=int, default=TOP_K, help="Number of articles to retrieve")
+    parser.add_argument("--articles", action="store_true", help="Retrieve whole articles instead of chunks")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKENS, help="Maximum number of prompt tokens")
+    parser.add_argument("--backend", choices=sorted(LLM_BACKENDS), help="LLM backend (default: LLM_BACKEND or openai)")
+    parser.add_argument("--model", help="Chat model (default: LLM_MODEL or %s)" % DEFAULT_LLM_MODEL)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+
+    question = args.question or input("Enter your question: ")
+    stats = asyncio.run(answer_question(
+        question,
+        write_token,
+        k=args.k,
+        use_chunks=not args.articles,
+        budget=args.budget,
+        llm=get_llm(args.backend, args.model),
+    ))
+
+    print("\n\n=== Sources ===")
+    for index, (title, url) in enumerate(stats["sources"], 1):
+        print(f"[{index}] {title} - {url}")
+    print(f"\nContext tokens: {stats['context_tokens']} / {args.budget}")
+    print(f"Retrieval: {stats['retrieval']:.2f}s, time to first token: {stats['ttft']:.2f}s, total: {stats['total']:.2f}s")
+
+if __name__ == "__main__":
+    main()
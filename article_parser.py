@@ -0,0 +1,314 @@
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+# HTML backend used to parse article pages: "lxml", "selectolax" or "html.parser"
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml")
+
+# Traversal events emitted by the backends
+START = "start"
+END = "end"
+
+# Month names of article dates. Matched explicitly rather than with strptime,
+# whose %B depends on the locale of the process.
+MONTHS = {
+    "januar": 1, "jänner": 1, "februar": 2, "märz": 3, "april": 4, "mai": 5, "juni": 6,
+    "juli": 7, "august": 8, "september": 9, "oktober": 10, "november": 11, "dezember": 12,
+    "january": 1, "february": 2, "march": 3, "may": 5, "june": 6, "july": 7, "october": 10, "december": 12,
+}
+
+_ARTICLE_DATE = re.compile(r"(\d{1,2})\.\s*(?:(\d{1,2})\.|([^\W\d_]+))\s*(\d{4})")
+
+def parse_article_date(date: str) -> datetime:
+    """Parse the date of an article.
+
+    The date format is like "Club, 14. April 2025" or "Profis, 3. März 2025",
+    numeric dates like "14.04.2025" are accepted too. Raises ValueError if
+    the text contains no date.
+    """
+    match = _ARTICLE_DATE.search(date)
+    if not match:
+        raise ValueError(f"No date found in {date!r}")
+    day, month_number, month_name, year = match.groups()
+    if month_name:
+        if month_name.lower() not in MONTHS:
+            raise ValueError(f"Unknown month {month_name!r} in {date!r}")
+        month = MONTHS[month_name.lower()]
+    else:
+        month = int(month_number)
+    return datetime(int(year), month, int(day))
+
+def _walk_lxml(html_content: str) -> Iterator[Tuple[str, Any]]:
+    """Yield start/end events for every element of a page parsed with lxml."""
+    from lxml import etree, html as lxml_html
+
+    if not html_content.strip():
+        return
+    root = lxml_html.document_fromstring(html_content)
+    for event, element in etree.iterwalk(root, events=(START, END)):
+        # Skip comments and processing instructions
+        if isinstance(element.tag, str):
+            yield event, element
+
+def _is_selectolax_element(node) -> bool:
+    """Text, comment and doctype nodes have tags like "-text" or "#comment"."""
+    return bool(node.tag) and node.tag[0].isalpha()
+
+def _walk_selectolax(html_content: str) -> Iterator[Tuple[str, Any]]:
+    """Yield start/end events for every element of a page parsed with selectolax."""
+    from selectolax.lexbor import LexborHTMLParser
+
+    root = LexborHTMLParser(html_content).root
+    if root is None:
+        return
+
+    # Iterative depth-first walk using the sibling links of the tree. Node
+    # wrappers are recreated on every access, so track the depth instead of
+    # comparing nodes to find the way back to the root.
+    node = root
+    depth = 0
+    while True:
+        yield START, node
+        child = node.child
+        while child is not None and not _is_selectolax_element(child):
+            child = child.next
+        if child is not None:
+            node = child
+            depth += 1
+            continue
+        while True:
+            yield END, node
+            if depth == 0:
+                return
+            sibling = node.next
+            while sibling is not None and not _is_selectolax_element(sibling):
+                sibling = sibling.next
+            if sibling is not None:
+                node = sibling
+                break
+            node = node.parent
+            depth -= 1
+
+def _walk_html_parser(html_content: str) -> Iterator[Tuple[str, Any]]:
+    """Yield start/end events for every element of a page parsed with BeautifulSoup."""
+    from bs4 import BeautifulSoup, Tag
+
+    soup = BeautifulSoup(html_content, "html.parser")
+    stack = [iter(soup.children)]
+    opened = []
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, Tag):
+                yield START, child
+                stack.append(iter(child.children))
+                opened.append(child)
+                break
+        else:
+            stack.pop()
+            if opened:
+                yield END, opened.pop()
+
+def _lxml_node(element) -> Tuple[str, list, Any, Any]:
+    return element.tag, element.get("class", "").split(), element.get, element.text_content
+
+def _selectolax_node(node) -> Tuple[str, list, Any, Any]:
+    attributes = node.attributes
+    return node.tag, (attributes.get("class") or "").split(), attributes.get, node.text
+
+def _html_parser_node(tag) -> Tuple[str, list, Any, Any]:
+    def get_attribute(name, default=None):
+        # BeautifulSoup returns multi-valued attributes like rel as lists
+        value = tag.get(name, default)
+        return " ".join(value) if isinstance(value, list) else value
+
+    return tag.name, tag.get("class") or [], get_attribute, tag.get_text
+
+BACKENDS = {
+    "lxml": (_walk_lxml, _lxml_node),
+    "selectolax": (_walk_selectolax, _selectolax_node),
+    "html.parser": (_walk_html_parser, _html_parser_node),
+}
+
+def _elements(html_content: str, backend: str = None) -> Iterator[Tuple[str, Any]]:
+    """Walk a page once, yielding (START, element info) and (END, None) events.
+
+    Element info is a (tag, classes, get_attribute, get_text) tuple.
+    """
+    backend = backend or HTML_PARSER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {backend}")
+    walk, describe = BACKENDS[backend]
+
+    for event, node in walk(html_content):
+        yield event, describe(node) if event == START else None
+
+def parse_article(html_content: str, backend: str = None) -> Dict[str, Any]:
+    """Extract title, date, categories, image and paragraphs from an article page.
+
+    The page is walked exactly once. The result contains:
+    - title: text of the first ``div.teaser h1`` on the page
+    - content_title: text of the first ``div.teaser h1`` inside ``div.content``
+    - date: text of the first ``.date`` element
+    - categories: texts of all ``.directories a`` elements
+    - image_url: ``src`` of the first ``.image img`` element (not resolved)
+    - paragraphs: non-empty ``p`` texts inside the first ``div.content``
+    - body_paragraphs: the subset of paragraphs inside ``div.meldung-bild``
+    - content_found: whether the page has a ``div.content`` at all
+    - canonical_url: ``link[rel=canonical]`` or ``og:url`` of the page
+    - description: ``description`` or ``og:description`` meta content
+    """
+    result = {
+        "title": "",
+        "content_title": "",
+        "date": "",
+        "categories": [],
+        "image_url": "",
+        "paragraphs": [],
+        "body_paragraphs": [],
+        "content_found": False,
+        "canonical_url": "",
+        "description": "",
+    }
+    title_found = False
+    content_title_found = False
+    date_found = False
+    image_found = False
+
+    # Number of currently open ancestors matching each container selector
+    open_containers = {"content": 0, "meldung-bild": 0, "teaser": 0, "directories": 0, "image": 0}
+    # Containers opened by each element on the current path, closed on its end event
+    opened_by = []
+
+    for event, element in _elements(html_content, backend):
+        if event == END:
+            for name in opened_by.pop():
+                open_containers[name] -= 1
+            continue
+
+        tag, classes, get_attribute, get_text = element
+        opened = []
+
+        if tag == "p" and open_containers["content"]:
+            text = get_text().strip()
+            if text:
+                result["paragraphs"].append(text)
+                if open_containers["meldung-bild"]:
+                    result["body_paragraphs"].append(text)
+        elif tag == "h1" and open_containers["teaser"] and not (title_found and content_title_found):
+            text = get_text().strip()
+            if not title_found:
+                result["title"] = text
+                title_found = True
+            if open_containers["content"] and not content_title_found:
+                result["content_title"] = text
+                content_title_found = True
+        elif tag == "a" and open_containers["directories"]:
+            result["categories"].append(get_text().strip())
+        elif tag == "img" and open_containers["image"] and not image_found:
+            result["image_url"] = get_attribute("src") or ""
+            image_found = True
+        elif tag == "link" and not result["canonical_url"]:
+            if "canonical" in (get_attribute("rel") or "").split():
+                result["canonical_url"] = get_attribute("href") or ""
+        elif tag == "meta":
+            name = get_attribute("property") or get_attribute("name")
+            if name == "og:url" and not result["canonical_url"]:
+                result["canonical_url"] = get_attribute("content") or ""
+            elif name in ("description", "og:description") and not result["description"]:
+                result["description"] = (get_attribute("content") or "").strip()
+
+        if "date" in classes and not date_found:
+            result["date"] = get_text().strip()
+            date_found = True
+        if "directories" in classes:
+            opened.append("directories")
+        if "image" in classes:
+            opened.append("image")
+        if tag == "div":
+            # Only the first div.content on the page holds the article
+            if "content" in classes and not result["content_found"]:
+                result["content_found"] = True
+                opened.append("content")
+            if "meldung-bild" in classes:
+                opened.append("meldung-bild")
+            if "teaser" in classes:
+                opened.append("teaser")
+
+        for name in opened:
+            open_containers[name] += 1
+        opened_by.append(opened)
+
+    return result
+
+def parse_listing(html_content: str, backend: str = None) -> List[Dict[str, Any]]:
+    """Extract the article teasers from the news listing page in a single pass.
+
+    Returns one entry per ``article.teaserArchiveArticle`` with the fields the
+    crawler reads from the listing: title, url, date, summary, image_url and
+    categories. URLs are returned as found in the page, not resolved.
+    """
+    teasers = []
+    teaser = None
+    # Depth of the current teaser and open containers inside it
+    depth = 0
+    teaser_depth = None
+    open_containers = {"text": 0, "image": 0, "directories": 0}
+    opened_by = []
+
+    for event, element in _elements(html_content, backend):
+        if event == END:
+            for name in opened_by.pop():
+                open_containers[name] -= 1
+            depth -= 1
+            if depth == teaser_depth:
+                teaser_depth = None
+            continue
+
+        depth += 1
+        tag, classes, get_attribute, get_text = element
+        opened = []
+
+        if teaser_depth is None:
+            if tag == "article" and "teaserArchiveArticle" in classes:
+                teaser = {"title": "", "url": "", "date": "", "summary": "", "image_url": "", "categories": []}
+                teasers.append(teaser)
+                teaser_depth = depth - 1
+                found = set()
+        else:
+            # Like the crawler, take the first match of each selector even if it is empty
+            if "title" in classes and "title" not in found:
+                teaser["title"] = get_text().strip()
+                found.add("title")
+            if "date" in classes and "date" not in found:
+                teaser["date"] = get_text().strip()
+                found.add("date")
+            if tag == "a" and "url" not in found and "/aktuell/neues/" in (get_attribute("href") or ""):
+                teaser["url"] = get_attribute("href")
+                found.add("url")
+            if tag == "p" and open_containers["text"] and "summary" not in found:
+                teaser["summary"] = get_text().strip()
+                found.add("summary")
+            if tag == "img" and open_containers["image"] and "image_url" not in found:
+                teaser["image_url"] = get_attribute("src") or ""
+                found.add("image_url")
+            if tag == "a" and open_containers["directories"]:
+                teaser["categories"].append(get_text().strip())
+            for name in ("text", "image", "directories"):
+                if name in classes:
+                    opened.append(name)
+
+        for name in opened:
+            open_containers[name] += 1
+        opened_by.append(opened)
+
+    return teasers
+
+def article_text(parsed: Dict[str, Any]) -> str:
+    """Join the article paragraphs, preferring the ones in ``div.meldung-bild``."""
+    return "\n\n".join(parsed["body_paragraphs"] or parsed["paragraphs"])
+
+def article_filename(title: str) -> str:
+    """Create the base filename used for the files of an article."""
+    filename = title.lower().replace(" ", "_")
+    return "".join(c for c in filename if c.isalnum() or c == "_")
@@ -0,0 +1,247 @@
+import time
+import argparse
+from datetime import datetime
+from sqlalchemy import text
+from dotenv import load_dotenv
+from embedding_model import get_embeddings, embedding_model_name, embedding_version, content_hash, CONTENT_HASH_SQL
+from models.database import SessionLocal, to_pgvector
+from models.embedding_backfill import EmbeddingBackfill
+from chunking import embed_texts
+
+# Number of articles embedded per request
+BATCH_SIZE = 32
+
+# Upper bound of articles embedded per minute, to leave quota for other jobs
+ROWS_PER_MINUTE = 600
+
+# Chunks embedded per batch, and per minute at most
+CHUNK_BATCH_SIZE = 160
+CHUNKS_PER_MINUTE = 3000
+
+# Articles whose embeddings are from another version or whose content changed
+# since they were embedded. Articles stored without embeddings (near-duplicates)
+# and articles whose shadow columns are already up to date are left alone.
+STALE_ROWS_QUERY = text(f"""
+    SELECT id, content, summary
+    FROM blog_articles
+    WHERE id > :last_id
+      AND (content_embedding IS NOT NULL OR summary_embedding IS NOT NULL)
+      AND (embedding_version IS DISTINCT FROM :target OR content_hash IS DISTINCT FROM {CONTENT_HASH_SQL})
+      AND (embedding_version_next IS DISTINCT FROM :target OR content_hash_next IS DISTINCT FROM {CONTENT_HASH_SQL})
+    ORDER BY id
+    LIMIT :batch_size
+""")
+
+WRITE_SHADOW_QUERY = text("""
+    UPDATE blog_articles
+    SET content_embedding_next = CAST(:content_embedding AS vector),
+        summary_embedding_next = CAST(:summary_embedding AS vector),
+        embedding_version_next = :target,
+        content_hash_next = :content_hash
+    WHERE id = :id
+""")
+
+# Chunks are re-embedded into their own shadow columns the same way
+STALE_CHUNKS_QUERY = text("""
+    SELECT id, content, token_count
+    FROM article_chunks
+    WHERE id > :last_id
+      AND embedding IS NOT NULL
+      AND embedding_version IS DISTINCT FROM :target
+      AND embedding_version_next IS DISTINCT FROM :target
+    ORDER BY id
+    LIMIT :batch_size
+""")
+
+WRITE_CHUNK_SHADOW_QUERY = text("""
+    UPDATE article_chunks
+    SET embedding_next = CAST(:embedding AS vector),
+        embedding_version_next = :target
+    WHERE id = :id
+""")
+
+# Replaces the live embeddings with the shadow columns, in the same
+# transaction for articles and chunks
+SWAP_QUERY = text("""
+    UPDATE blog_articles
+    SET content_embedding = content_embedding_next,
+        summary_embedding = summary_embedding_next,
+        embedding_version = embedding_version_next,
+        content_hash = content_hash_next,
+        content_embedding_next = NULL,
+        summary_embedding_next = NULL,
+        embedding_version_next = NULL,
+        content_hash_next = NULL
+    WHERE embedding_version_next = :target
+""")
+
+SWAP_CHUNKS_QUERY = text("""
+    UPDATE article_chunks
+    SET embedding = embedding_next,
+        embedding_version = embedding_version_next,
+        embedding_next = NULL,
+        embedding_version_next = NULL
+    WHERE embedding_version_next = :target
+""")
+
+def load_checkpoint(db, target):
+    """Return the checkpoint of the backfill towards target, starting a new pass if needed."""
+    now = datetime.now()
+    checkpoint = db.get(EmbeddingBackfill, target)
+    if checkpoint is None:
+        checkpoint = EmbeddingBackfill(target_version=target, last_id=0, rows_embedded=0, started_at=now, updated_at=now)
+        db.add(checkpoint)
+    elif checkpoint.finished_at is not None:
+        # A finished backfill is run again to pick up articles changed since
+        checkpoint.last_id = 0
+        checkpoint.rows_embedded = 0
+        checkpoint.started_at = now
+        checkpoint.finished_at = None
+    else:
+        print(f"Resuming backfill to {target} after article {checkpoint.last_id} ({checkpoint.rows_embedded} embedded so far)")
+    checkpoint.updated_at = now
+    db.commit()
+    return checkpoint
+
+def swap_embeddings(db, target):
+    """Atomically switch all articles and chunks with shadow embeddings of target over to them."""
+    swapped = db.execute(SWAP_QUERY, {"target": target}).rowcount
+    swapped_chunks = db.execute(SWAP_CHUNKS_QUERY, {"target": target}).rowcount
+    checkpoint = db.get(EmbeddingBackfill, target)
+    if checkpoint is not None:
+        checkpoint.finished_at = checkpoint.updated_at = datetime.now()
+    db.commit()
+    print(f"Swapped in {swapped} re-embedded articles and {swapped_chunks} chunks for {target}")
+
+def backfill_chunks(db, embeddings, target, batch_size=CHUNK_BATCH_SIZE, chunks_per_minute=CHUNKS_PER_MINUTE):
+    """Re-embed the chunks of another version into their shadow columns.
+
+    Chunks already re-embedded are not selected again, so an interrupted run
+    continues with the remaining ones.
+    """
+    min_batch_seconds = 60 * batch_size / chunks_per_minute
+    last_id = 0
+    embedded = 0
+    while True:
+        batch_started = time.monotonic()
+        rows = db.execute(STALE_CHUNKS_QUERY, {
+            "last_id": last_id, "target": target, "batch_size": batch_size
+        }).fetchall()
+        if not rows:
+            break
+
+        vectors = embed_texts(embeddings, [row.content for row in rows], [row.token_count for row in rows])
+        db.execute(WRITE_CHUNK_SHADOW_QUERY, [{
+            "id": row.id,
+            "embedding": to_pgvector(vector),
+            "target": target,
+        } for row, vector in zip(rows, vectors)])
+        db.commit()
+        last_id = rows[-1].id
+        embedded += len(rows)
+        print(f"Re-embedded {embedded} chunks for {target} (up to chunk {last_id})")
+
+        elapsed = time.monotonic() - batch_started
+        if elapsed < min_batch_seconds:
+            time.sleep(min_batch_seconds - elapsed)
+
+def backfill_articles(db, embeddings, target, batch_size=BATCH_SIZE, rows_per_minute=ROWS_PER_MINUTE):
+    """Re-embed stale articles into the shadow columns.
+
+    Progress is checkpointed after every batch, so an interrupted run
+    continues where it stopped.
+    """
+    min_batch_seconds = 60 * batch_size / rows_per_minute
+    checkpoint = load_checkpoint(db, target)
+
+    while True:
+        batch_started = time.monotonic()
+        rows = db.execute(STALE_ROWS_QUERY, {
+            "last_id": checkpoint.last_id, "target": target, "batch_size": batch_size
+        }).fetchall()
+
+        if not rows:
+            # Articles changed behind the checkpoint during this pass need another pass
+            remaining = db.execute(STALE_ROWS_QUERY, {"last_id": 0, "target": target, "batch_size": 1}).fetchall()
+            if remaining and checkpoint.last_id > 0:
+                checkpoint.last_id = 0
+                db.commit()
+                continue
+            break
+
+        # Embed contents and summaries of the whole batch in one request
+        vectors = embeddings.embed_documents(
+            [row.content for row in rows] + [row.summary for row in rows]
+        )
+        db.execute(WRITE_SHADOW_QUERY, [{
+            "id": row.id,
+            "content_embedding": to_pgvector(vectors[i]),
+            "summary_embedding": to_pgvector(vectors[len(rows) + i]),
+            "target": target,
+            "content_hash": content_hash(row.content, row.summary),
+        } for i, row in enumerate(rows)])
+
+        # The checkpoint is committed together with the batch
+        checkpoint.last_id = rows[-1].id
+        checkpoint.rows_embedded += len(rows)
+        checkpoint.updated_at = datetime.now()
+        db.commit()
+        print(f"Re-embedded {checkpoint.rows_embedded} articles for {target} (up to article {checkpoint.last_id})")
+
+        # Throttle to stay below rows_per_minute
+        elapsed = time.monotonic() - batch_started
+        if elapsed < min_batch_seconds:
+            time.sleep(min_batch_seconds - elapsed)
+
+def backfill_embeddings(model=None, batch_size=BATCH_SIZE, rows_per_minute=ROWS_PER_MINUTE, swap=True):
+    """Re-embed stale articles into the shadow columns, then swap them in.
+
+    The chunks of all articles are re-embedded the same way after the
+    articles and swapped together with them. Search keeps using the live
+    columns until the swap.
+    """
+    load_dotenv()
+
+    model = model or embedding_model_name()
+    target = embedding_version(model)
+    embeddings = get_embeddings(model)
+
+    db = SessionLocal()
+
+    try:
+        backfill_articles(db, embeddings, target, batch_size, rows_per_minute)
+        backfill_chunks(db, embeddings, target)
+
+        if swap:
+            swap_embeddings(db, target)
+        else:
+            print(f"Shadow embeddings for {target} are complete, run with --swap-only to switch over")
+
+    except Exception as e:
+        print(f"Error backfilling embeddings: {str(e)}")
+        db.rollback()
+
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-embed stale articles in the background and swap in the new embeddings.")
+    parser.add_argument("--model", help="Embedding model to re-embed with (default: EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Articles embedded per request")
+    parser.add_argument("--rows-per-minute", type=int, default=ROWS_PER_MINUTE, help="Maximum number of articles embedded per minute")
+    parser.add_argument("--no-swap", action="store_true", help="Only fill the shadow columns")
+    parser.add_argument("--swap-only", action="store_true", help="Only swap in shadow embeddings of a finished backfill")
+    args = parser.parse_args(argv)
+
+    if args.swap_only:
+        load_dotenv()
+        db = SessionLocal()
+        try:
+            swap_embeddings(db, embedding_version(args.model))
+        finally:
+            db.close()
+    else:
+        backfill_embeddings(args.model, args.batch_size, args.rows_per_minute, swap=not args.no_swap)
+
+if __name__ == "__main__":
+    main()
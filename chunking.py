@@ -0,0 +1,247 @@
+import re
+import math
+import argparse
+from typing import Iterator, List, Tuple
+
+# Maximum number of tokens per chunk and tokens repeated from the previous chunk
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 60
+
+# Limits per embedding request: the API accepts at most 300k tokens, and
+# langchain's OpenAIEmbeddings sends at most 1000 inputs per request
+BATCH_TOKENS = 250000
+BATCH_INPUTS = 1000
+
+# Articles chunked per transaction by chunk_articles
+ARTICLES_PER_COMMIT = 50
+
+# Tokenizer of the text-embedding-3 models, loaded on first use (tiktoken may
+# download it), or False if tiktoken is not installed or the download failed
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+        except Exception as e:
+            print(f"Could not load the tiktoken encoding, estimating token counts: {str(e)}")
+            _encoding = False
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text, estimating 4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+def _split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """Cut a text without sentence breaks into pieces of at most max_tokens."""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text)
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    size = max_tokens * 4
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Return the beginning of a text of at most max_tokens."""
+    return _split_by_tokens(text, max_tokens)[0] if count_tokens(text) > max_tokens else text
+
+def _split_paragraph(paragraph: str, max_tokens: int) -> List[str]:
+    """Split a paragraph that exceeds the budget into sentences, or token windows as a last resort."""
+    pieces = []
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+        else:
+            pieces.extend(_split_by_tokens(sentence, max_tokens))
+    return pieces
+
+def chunk_text(content: str, max_tokens: int = CHUNK_TOKENS,
+               overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Tuple[str, int]]:
+    """Split article content into chunks of at most max_tokens.
+
+    Chunks are built from whole paragraphs (separated by blank lines, as
+    written by the crawler). Each chunk starts with the last paragraphs of
+    the previous one, up to overlap_tokens. Returns (text, token count) pairs.
+    """
+    units = []
+    for paragraph in content.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            units.append((paragraph, tokens))
+        else:
+            units.extend((piece, count_tokens(piece)) for piece in _split_paragraph(paragraph, max_tokens))
+
+    # The blank lines joining the paragraphs of a chunk count against the budget too
+    separator_tokens = count_tokens("\n\n")
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit, tokens in units:
+        if current and current_tokens + separator_tokens + tokens > max_tokens:
+            chunks.append(current)
+            # Carry the trailing paragraphs over, as long as they fit the overlap
+            overlap = []
+            overlap_used = 0
+            for previous, previous_tokens in reversed(current):
+                needed = previous_tokens + (separator_tokens if overlap else 0)
+                if overlap_used + needed > overlap_tokens:
+                    break
+                overlap.insert(0, (previous, previous_tokens))
+                overlap_used += needed
+            if overlap and overlap_used + separator_tokens + tokens > max_tokens:
+                overlap, overlap_used = [], 0
+            current, current_tokens = overlap, overlap_used
+        if current:
+            current_tokens += separator_tokens
+        current.append((unit, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+
+    result = []
+    for chunk in chunks:
+        text = "\n\n".join(unit for unit, _ in chunk)
+        result.append((text, count_tokens(text)))
+    return result
+
+def pack_batches(token_counts: List[int], max_tokens: int = BATCH_TOKENS,
+                 max_inputs: int = BATCH_INPUTS) -> Iterator[List[int]]:
+    """Group inputs into batches that fill embedding requests as far as allowed.
+
+    Yields lists of indices into token_counts, keeping the input order.
+    """
+    batch = []
+    batch_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def embed_texts(embeddings, texts: List[str], token_counts: List[int]) -> List[List[float]]:
+    """Embed texts in as few requests as possible."""
+    vectors = [None] * len(texts)
+    for batch in pack_batches(token_counts):
+        for index, vector in zip(batch, embeddings.embed_documents([texts[i] for i in batch])):
+            vectors[index] = vector
+    return vectors
+
+async def aembed_texts(embeddings, texts: List[str], token_counts: List[int]) -> List[List[float]]:
+    """Embed texts in as few requests as possible without blocking the event loop."""
+    vectors = [None] * len(texts)
+    for batch in pack_batches(token_counts):
+        for index, vector in zip(batch, await embeddings.aembed_documents([texts[i] for i in batch])):
+            vectors[index] = vector
+    return vectors
+
+def build_article_chunks(blog_articles):
+    """Split articles that already have an ID into ArticleChunk objects without embeddings."""
+    from models.article_chunk import ArticleChunk
+    from embedding_model import embedding_version
+
+    version = embedding_version()
+    return [
+        ArticleChunk(
+            article_id=blog_article.id,
+            chunk_index=chunk_index,
+            content=text,
+            token_count=tokens,
+            embedding_version=version
+        )
+        for blog_article in blog_articles
+        for chunk_index, (text, tokens) in enumerate(chunk_text(blog_article.content))
+    ]
+
+def embed_chunks(embeddings, chunks):
+    """Embed chunks, packing the chunks of all articles into shared requests."""
+    vectors = embed_texts(embeddings, [chunk.content for chunk in chunks], [chunk.token_count for chunk in chunks])
+    for chunk, vector in zip(chunks, vectors):
+        chunk.embedding = vector
+    return chunks
+
+async def aembed_chunks(embeddings, chunks):
+    """Embed chunks like embed_chunks without blocking the event loop."""
+    vectors = await aembed_texts(embeddings, [chunk.content for chunk in chunks], [chunk.token_count for chunk in chunks])
+    for chunk, vector in zip(chunks, vectors):
+        chunk.embedding = vector
+    return chunks
+
+def chunk_articles(articles_per_commit: int = ARTICLES_PER_COMMIT):
+    """Create chunks for all embedded articles without up-to-date chunks."""
+    from sqlalchemy import select, exists, or_
+    from embedding_model import get_embeddings, embedding_version
+    from models.database import SessionLocal
+    from models.blog_article import BlogArticle
+    from models.article_chunk import ArticleChunk
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    embeddings = get_embeddings()
+    version = embedding_version()
+
+    db = SessionLocal()
+
+    try:
+        # Near-duplicates stored without embeddings are not chunked either, nor
+        # articles without text, which would have no chunks and be selected again
+        missing_or_stale = select(BlogArticle).where(
+            BlogArticle.content_embedding.isnot(None),
+            BlogArticle.content.op("~")(r"\S"),
+            or_(
+                ~exists().where(ArticleChunk.article_id == BlogArticle.id),
+                exists().where(
+                    ArticleChunk.article_id == BlogArticle.id,
+                    ArticleChunk.embedding_version.is_distinct_from(version)
+                )
+            )
+        ).order_by(BlogArticle.id).limit(articles_per_commit)
+
+        total = 0
+        # Every article is processed at most once, even if it gets no chunks
+        last_id = 0
+        while True:
+            blog_articles = db.execute(missing_or_stale.where(BlogArticle.id > last_id)).scalars().all()
+            if not blog_articles:
+                break
+            last_id = blog_articles[-1].id
+            db.query(ArticleChunk).filter(
+                ArticleChunk.article_id.in_([blog_article.id for blog_article in blog_articles])
+            ).delete(synchronize_session=False)
+            chunks = embed_chunks(embeddings, build_article_chunks(blog_articles))
+            db.add_all(chunks)
+            db.commit()
+            total += len(blog_articles)
+            print(f"Chunked {total} articles ({len(chunks)} chunks in the last batch)")
+
+        print(f"Successfully chunked {total} articles")
+
+    except Exception as e:
+        print(f"Error chunking articles: {str(e)}")
+        db.rollback()
+
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split embedded articles into chunks with their own embeddings.")
+    parser.add_argument("--articles-per-commit", type=int, default=ARTICLES_PER_COMMIT, help="Articles chunked per transaction")
+    args = parser.parse_args(argv)
+
+    chunk_articles(args.articles_per_commit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import sys
+import time
+import argparse
+
+# Subcommands with the module and function running them. Modules are only
+# imported when their subcommand runs, so that e.g. a search does not load
+# Selenium. Functions named main take the remaining arguments, the others
+# take none.
+COMMANDS = {
+    "crawl": ("crawl_blog", "crawl_blog_articles", "Crawl the blog with Selenium and save the articles as JSON"),
+    "replay": ("replay_blog", "main", "Re-parse archived pages into a JSON file"),
+    "ingest": ("pipeline", "main", "Crawl, embed and load new articles in one pipelined run"),
+    "embed": ("create_embeddings", "create_embeddings", "Create embeddings for the crawled JSON files"),
+    "load": ("load_embeddings", "main", "Embed the articles of a JSON file and load them into the database"),
+    "chunk": ("chunking", "main", "Split embedded articles into chunks with their own embeddings"),
+    "backfill": ("backfill_embeddings", "main", "Re-embed stale articles and swap in the new embeddings"),
+    "search": ("get_entry", "main", "Find the articles most similar to a search text"),
+    "answer": ("answer", "main", "Answer a question from the blog articles"),
+    "partitions": ("partitions", "main", "Create the blog_articles partitions of the current and next season"),
+    "players": ("main", "crawl_player_profiles", "Crawl player profiles into the PLAYER_PROFILES table"),
+    "init-db": ("init_db", "init_db", "Create the PLAYER_PROFILES table"),
+}
+
+def import_command(module_name, profile=False):
+    """Import the module of a subcommand, reporting the import time if profile is set."""
+    import importlib
+
+    loaded = set(sys.modules)
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - started
+
+    if profile:
+        new_modules = set(sys.modules) - loaded
+        packages = sorted({name.split(".")[0] for name in new_modules if not name.startswith("_")} - set(sys.stdlib_module_names))
+        print(f"[startup] Imported {module_name} in {elapsed * 1000:.0f}ms ({len(new_modules)} modules)", file=sys.stderr)
+        print(f"[startup] Packages outside the standard library: {', '.join(packages)}", file=sys.stderr)
+        print("[startup] Run with python -X importtime for the time of every module", file=sys.stderr)
+    return module
+
+def main(argv=None):
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(prog="vfb-rag", description="Crawl, embed and search the VfB Stuttgart blog.")
+    parser.add_argument("--profile-startup", action="store_true", help="Report the time spent importing the subcommand")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, _, description) in COMMANDS.items():
+        # The subcommand's own options are parsed by its module
+        subparsers.add_parser(name, help=description, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    module_name, function_name, _ = COMMANDS[args.command]
+    if function_name != "main" and rest:
+        parser.error(f"{args.command} takes no arguments: {' '.join(rest)}")
+
+    # Settings from .env must be in the environment before modules read them
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    function = getattr(import_command(module_name, args.profile_startup), function_name)
+    if args.profile_startup:
+        print(f"[startup] Ready to run {args.command} after {(time.perf_counter() - started) * 1000:.0f}ms", file=sys.stderr)
+
+    if function_name == "main":
+        sys.argv[0] = f"vfb-rag {args.command}"
+        function(rest)
+    else:
+        function()
+
+if __name__ == "__main__":
+    main()
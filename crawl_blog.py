@@ -10,15 +10,14 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from article_parser import parse_article, article_text
+from page_archive import PageArchive, LISTING, ARTICLE
 
 # Base URL for the VfB website
 BASE_URL = "https://www.vfb.de/de/1893/aktuell/neues/"
 
-# Create a directory to store blog articles if it doesn't exist
+# Directory to store blog articles in, created when the first file is written
 OUTPUT_DIR = "blog_articles"
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
 
 # Maximum number of articles to process
 MAX_ARTICLES = 3
@@ -37,17 +36,6 @@ def setup_driver():
     driver = webdriver.Chrome(service=service, options=chrome_options)
     return driver
 
-def save_page_source(driver, filename):
-    """Save the current page source to a file for debugging."""
-    debug_dir = os.path.join(OUTPUT_DIR, "debug")
-    if not os.path.exists(debug_dir):
-        os.makedirs(debug_dir)
-    
-    file_path = os.path.join(debug_dir, filename)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(driver.page_source)
-    print(f"Saved page source to {file_path}")
-
 def safe_find_element(element, by, value, max_retries=3):
     """Safely find an element with retry logic for stale elements."""
     for attempt in range(max_retries):
@@ -129,8 +117,11 @@ def extract_article_data(article_element, driver):
         print(f"Error extracting article data: {str(e)}")
         return None
 
-def extract_article_content(driver, article_url):
-    """Extract the full content of an article from its page."""
+def extract_article_content(driver, article_url, archive=None):
+    """Extract the full content of an article from its page.
+    
+    If an archive is given, the raw page source is stored in it as well.
+    """
     try:
         # Navigate to the article page
         print(f"Navigating to article: {article_url}")
@@ -146,50 +137,24 @@ def extract_article_content(driver, article_url):
         
         # Get the article content
         article_html = driver.page_source
+        if archive is not None:
+            archive.put(article_url, article_html, kind=ARTICLE)
         
-        # Parse the HTML with BeautifulSoup
-        soup = BeautifulSoup(article_html, "html.parser")
-        
-        # Find the main content div
-        content_div = soup.select_one("div.content")
-        if not content_div:
+        # Parse the HTML in a single pass
+        parsed = parse_article(article_html)
+        if not parsed["content_found"]:
             print("Could not find content div")
             return {
                 "title": "",
                 "content": ""
             }
         
-        # Extract the article title
-        title = ""
-        title_element = content_div.select_one("div.teaser h1")
-        if title_element:
-            title = title_element.text.strip()
-        
-        # Extract the article text
-        article_text = ""
-        
-        # Find all paragraphs in the content
-        paragraphs = content_div.select("div.meldung-bild p")
-        if paragraphs:
-            for p in paragraphs:
-                # Skip empty paragraphs
-                if p.text.strip():
-                    article_text += p.text.strip() + "\n\n"
-        
-        # If no paragraphs found in meldung-bild, try other selectors
-        if not article_text:
-            paragraphs = content_div.select("p")
-            for p in paragraphs:
-                # Skip empty paragraphs
-                if p.text.strip():
-                    article_text += p.text.strip() + "\n\n"
-        
-        # Clean up the text
-        article_text = article_text.strip()
+        title = parsed["content_title"]
+        content = article_text(parsed)
         
         return {
             "title": title,
-            "content": article_text
+            "content": content
         }
     except Exception as e:
         print(f"Error extracting article content: {str(e)}")
@@ -201,6 +166,7 @@ def extract_article_content(driver, article_url):
 def crawl_blog_articles():
     """Crawl blog articles from the VfB Stuttgart website."""
     driver = setup_driver()
+    archive = PageArchive()
     
     try:
         # Navigate to the blog page
@@ -216,8 +182,8 @@ def crawl_blog_articles():
         # Give additional time for all content to load
         time.sleep(5)
         
-        # Save the page source for debugging
-        save_page_source(driver, "initial_page.html")
+        # Keep the listing page in the raw page archive
+        archive.put(BASE_URL, driver.page_source, kind=LISTING)
         
         # First, find the wrapper meldung div
         wrapper_elements = driver.find_elements(By.CSS_SELECTOR, "div.wrapper.meldung")
@@ -285,7 +251,7 @@ def crawl_blog_articles():
             time.sleep(3)
             
             # Extract the article content
-            content_data = extract_article_content(driver, article_url)
+            content_data = extract_article_content(driver, article_url, archive)
             
             # Navigate back to the main page
             print("Navigating back to main page...")
@@ -333,49 +299,12 @@ def crawl_blog_articles():
         # Save the articles to a JSON file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = os.path.join(OUTPUT_DIR, f"vfb_articles_{timestamp}.json")
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
         
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(articles, f, ensure_ascii=False, indent=2)
         
         print(f"Saved {len(articles)} articles to {output_file}")
-        
-        # Also save individual HTML files for each article
-        for article in articles:
-            try:
-                # Navigate to the article page
-                print(f"Navigating to article: {article['url']}")
-                driver.get(article["url"])
-                
-                # Wait for the content to load
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
-                
-                # Give additional time for all content to load
-                time.sleep(3)
-                
-                # Get the article content
-                article_html = driver.page_source
-                
-                # Create a filename from the title
-                filename = article["title"].lower().replace(" ", "_")
-                filename = "".join(c for c in filename if c.isalnum() or c == "_")
-                filename = f"{filename}.html"
-                
-                # Save the article HTML
-                article_file = os.path.join(OUTPUT_DIR, filename)
-                with open(article_file, "w", encoding="utf-8") as f:
-                    f.write(article_html)
-                
-                # Also save the extracted content as a text file
-                content_file = os.path.join(OUTPUT_DIR, f"{filename.replace('.html', '.txt')}")
-                with open(content_file, "w", encoding="utf-8") as f:
-                    f.write(f"Title: {article['full_title']}\n\n")
-                    f.write(article["content"])
-                
-                print(f"Saved article: {article['title']}")
-            except Exception as e:
-                print(f"Error saving article {article['title']}: {str(e)}")
     
     except Exception as e:
         print(f"Error during crawling: {str(e)}")
@@ -383,6 +312,7 @@ def crawl_blog_articles():
     finally:
         # Close the browser
         driver.quit()
+        archive.close()
 
 if __name__ == "__main__":
     crawl_blog_articles() 
\ No newline at end of file
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import List, Dict, Any
 from langchain.schema import Document
 from bs4 import BeautifulSoup
+from article_parser import parse_article
 from urllib.parse import urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -17,10 +18,8 @@ from webdriver_manager.chrome import ChromeDriverManager
 # Base URL for the VfB website
 BASE_URL = "https://www.vfb.de/de/1893/aktuell/neues/"
 
-# Create a directory to store blog articles if it doesn't exist
+# Directory to store blog articles in, created when the first file is written
 OUTPUT_DIR = "blog_articles_langchain"
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
 
 # Maximum number of articles to process
 MAX_ARTICLES = 3
@@ -83,47 +82,19 @@ def extract_article_links(html_content: str) -> List[str]:
 
 def extract_article_data(html_content: str, url: str) -> Dict[str, Any]:
     """Extract relevant data from an article page."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    
-    # Extract title
-    title = ""
-    title_element = soup.select_one("div.teaser h1")
-    if title_element:
-        title = title_element.text.strip()
-    
-    # Extract date
-    date = ""
-    date_element = soup.select_one(".date")
-    if date_element:
-        date = date_element.text.strip()
-    
-    # Extract content
-    content = ""
-    content_div = soup.select_one("div.content")
-    if content_div:
-        paragraphs = content_div.select("div.meldung-bild p, p")
-        for p in paragraphs:
-            if p.text.strip():
-                content += p.text.strip() + "\n\n"
-    
-    # Extract categories
-    categories = []
-    category_elements = soup.select(".directories a")
-    for category_element in category_elements:
-        categories.append(category_element.text.strip())
+    parsed = parse_article(html_content)
     
-    # Extract image URL
+    # Resolve the image URL relative to the article page
     image_url = ""
-    image_element = soup.select_one(".image img")
-    if image_element and image_element.get("src"):
-        image_url = urljoin(url, image_element["src"])
+    if parsed["image_url"]:
+        image_url = urljoin(url, parsed["image_url"])
     
     return {
-        "title": title,
+        "title": parsed["title"],
         "url": url,
-        "date": date,
-        "content": content.strip(),
-        "categories": categories,
+        "date": parsed["date"],
+        "content": "\n\n".join(parsed["paragraphs"]),
+        "categories": parsed["categories"],
         "image_url": image_url
     }
 
@@ -135,6 +106,7 @@ def save_article(article_data: Dict[str, Any]) -> None:
     filename = f"{filename}.json"
     
     file_path = os.path.join(OUTPUT_DIR, filename)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(article_data, f, ensure_ascii=False, indent=2)
     print(f"Saved article to {file_path}")
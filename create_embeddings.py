@@ -1,14 +1,10 @@
 import json
-import os
-from langchain_openai import OpenAIEmbeddings
+from embedding_model import get_embeddings
 from pathlib import Path
 
 def create_embeddings():
     # Initialize the embeddings model
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    embeddings = get_embeddings()
 
     # Create embeddings directory if it doesn't exist
     embeddings_dir = Path("blog_articles_embeddings")
@@ -19,15 +15,16 @@ def create_embeddings():
     with open(source_file, 'r', encoding='utf-8') as f:
         articles = json.load(f)
 
-    # Process each article and create embeddings
-    for article in articles:
-        # Generate embeddings for title and content
-        title_embedding = embeddings.embed_query(article['full_title'])
-        content_embedding = embeddings.embed_query(article['content'])
+    # Generate embeddings for titles and contents, packed into as few requests
+    # as the rate limits allow
+    vectors = embeddings.embed_documents(
+        [article['full_title'] for article in articles] + [article['content'] for article in articles]
+    )
 
-        # Add embeddings to the article data
-        article['embedding_full_title'] = title_embedding
-        article['embedding_content'] = content_embedding
+    # Add embeddings to the article data
+    for i, article in enumerate(articles):
+        article['embedding_full_title'] = vectors[i]
+        article['embedding_content'] = vectors[len(articles) + i]
 
     # Save the enhanced articles to a new JSON file
     output_file = embeddings_dir / "vfb_articles_with_embeddings.json"
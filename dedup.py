@@ -0,0 +1,199 @@
+import os
+import re
+import random
+import sqlite3
+import hashlib
+from array import array
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+# SQLite file holding the MinHash signatures and LSH buckets between runs
+DEDUP_INDEX = os.getenv("DEDUP_INDEX", "dedup_index.sqlite")
+
+# What to do with near-duplicates: "flag" stores them without embeddings,
+# "skip" does not store them at all, "off" disables the check
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+
+# Estimated Jaccard similarity of the shingles above which articles are near-duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+# Number of words per shingle
+SHINGLE_SIZE = 5
+
+# Texts with fewer words are not compared, as their few shingles (or none, for
+# an empty text) would make them near-duplicates of each other
+MIN_WORDS = 20
+
+# MinHash signature length, split into BANDS bands of ROWS values for LSH.
+# 16 bands of 8 rows make articles above ~0.7 similarity likely candidates.
+BANDS = 16
+ROWS = 8
+NUM_PERM = BANDS * ROWS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed, so signatures stay comparable between runs
+_random = random.Random(1893)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Return the set of word n-grams of a text, empty for texts shorter than MIN_WORDS words."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < max(MIN_WORDS, size):
+        return set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash(text: str) -> Optional[List[int]]:
+    """Compute the MinHash signature of a text's shingles, None if the text is too short."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def similarity(signature: List[int], other: List[int]) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+def band_buckets(signature: List[int]) -> List[str]:
+    """Hash each band of a signature to the LSH bucket it falls into."""
+    return [
+        hashlib.blake2b(array("Q", signature[band * ROWS:(band + 1) * ROWS]).tobytes(), digest_size=8).hexdigest()
+        for band in range(BANDS)
+    ]
+
+def new_cluster_id(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class DuplicateIndex:
+    """Persistent MinHash/LSH index assigning articles to near-duplicate clusters.
+
+    Every article gets a cluster ID: a near-duplicate joins the cluster of the
+    most similar indexed article, anything else starts a new cluster. Texts
+    too short to compare get no cluster.
+
+    Checked articles are kept in memory until they are saved, once they are
+    loaded, or discarded, so that an article that failed to load is checked
+    again on the next run.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX, threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        # key -> (cluster ID, key it duplicates, signature) of unsaved articles
+        self.pending = {}
+        self.pending_buckets = defaultdict(set)
+        self.index = sqlite3.connect(path)
+        self.index.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                key TEXT PRIMARY KEY,
+                cluster_id TEXT NOT NULL,
+                duplicate_of TEXT,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                key TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+        """)
+
+    def close(self) -> None:
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _entry(self, key: str) -> Optional[Tuple[str, Optional[str], List[int]]]:
+        """Return (cluster ID, key it duplicates, signature) of an indexed article."""
+        if key in self.pending:
+            return self.pending[key]
+        row = self.index.execute(
+            "SELECT cluster_id, duplicate_of, signature FROM signatures WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1], array("Q", row[2]).tolist()) if row else None
+
+    def find_duplicate(self, signature: List[int]) -> Optional[Tuple[str, str, float]]:
+        """Return (key, cluster ID, similarity) of the closest near-duplicate, if any."""
+        candidates = set()
+        for band, bucket in enumerate(band_buckets(signature)):
+            rows = self.index.execute(
+                "SELECT key FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+            )
+            candidates.update(row[0] for row in rows)
+            candidates.update(self.pending_buckets[band, bucket])
+
+        best = None
+        for key in candidates:
+            cluster_id, _, other = self._entry(key)
+            score = similarity(signature, other)
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (key, cluster_id, score)
+        return best
+
+    def check(self, key: str, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """Index an article and return its cluster ID and the key it duplicates.
+
+        The key of an article that is not a near-duplicate is returned as None,
+        and texts too short to compare return (None, None). Articles already in
+        the index keep their earlier result.
+        """
+        entry = self._entry(key)
+        if entry:
+            return entry[0], entry[1]
+
+        signature = minhash(text)
+        if signature is None:
+            return None, None
+        duplicate = self.find_duplicate(signature)
+        if duplicate:
+            duplicate_of, cluster_id, _ = duplicate
+            # The article was checked before and failed to load, but the
+            # duplicate found then was loaded: this article stays the original
+            if self._entry(duplicate_of)[1] == key:
+                duplicate_of = None
+        else:
+            duplicate_of, cluster_id = None, new_cluster_id(key)
+
+        self.pending[key] = (cluster_id, duplicate_of, signature)
+        for band, bucket in enumerate(band_buckets(signature)):
+            self.pending_buckets[band, bucket].add(key)
+        return cluster_id, duplicate_of
+
+    def _forget(self, key: str) -> Optional[Tuple[str, Optional[str], List[int]]]:
+        entry = self.pending.pop(key, None)
+        if entry:
+            for band, bucket in enumerate(band_buckets(entry[2])):
+                self.pending_buckets[band, bucket].discard(key)
+        return entry
+
+    def save(self, keys: Iterable[str]) -> None:
+        """Persist the checked articles that were loaded."""
+        entries = [(key, entry) for key in keys for entry in [self._forget(key)] if entry]
+        with self.index:
+            for key, (cluster_id, duplicate_of, signature) in entries:
+                self.index.execute(
+                    "INSERT INTO signatures (key, cluster_id, duplicate_of, signature) VALUES (?, ?, ?, ?)",
+                    (key, cluster_id, duplicate_of, array("Q", signature).tobytes())
+                )
+                self.index.executemany(
+                    "INSERT INTO buckets (band, bucket, key) VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in enumerate(band_buckets(signature))]
+                )
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """Forget the checked articles that were not loaded."""
+        for key in keys:
+            self._forget(key)
@@ -0,0 +1,120 @@
+import time
+import asyncio
+from typing import List, Optional
+import openai
+from langchain_core.embeddings import Embeddings
+from chunking import count_tokens, pack_batches, truncate_tokens
+from rate_limit import BULK, MAX_RETRIES, get_scheduler, backoff, is_retryable
+
+# Maximum number of tokens of a single input of the embedding models
+MAX_INPUT_TOKENS = 8191
+
+class RateLimitedEmbeddings(Embeddings):
+    """OpenAI embeddings sent through the process-wide RateLimitScheduler.
+
+    Can be used wherever LangChain expects an Embeddings object. Texts are
+    packed into as few requests as the per-request limits allow, and each
+    request is retried on its own with jittered backoff, so a rate limit or a
+    server error does not fail the whole job. Inputs longer than the model's
+    context are truncated. The base URL can be pointed to a local server with
+    OPENAI_BASE_URL, e.g. mock_embedding_server.py.
+    """
+
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 priority: int = BULK, scheduler=None, max_retries: int = MAX_RETRIES):
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.priority = priority
+        self.scheduler = scheduler or get_scheduler()
+        self.max_retries = max_retries
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Retries are done here, per request and paced by the scheduler
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._async_client
+
+    def _prepare(self, texts: List[str]):
+        """Return the inputs to send (empty or too long texts fixed up) and their token counts."""
+        inputs = []
+        token_counts = []
+        for text in texts:
+            text = text or " "
+            tokens = count_tokens(text)
+            if tokens > MAX_INPUT_TOKENS:
+                text = truncate_tokens(text, MAX_INPUT_TOKENS)
+                tokens = MAX_INPUT_TOKENS
+            inputs.append(text)
+            token_counts.append(tokens)
+        return inputs, token_counts
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Return how long to wait before retrying after an error, or raise it if it is final."""
+        if isinstance(error, openai.APIStatusError):
+            if not is_retryable(error.status_code):
+                raise error
+            if error.status_code == 429:
+                self.scheduler.rate_limited(error.response.headers)
+        elif not isinstance(error, openai.APIConnectionError):
+            raise error
+        if attempt >= self.max_retries:
+            raise error
+        delay = backoff(attempt)
+        print(f"Embedding request failed ({str(error)}), retry {attempt + 1} of {self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def _finish(self, raw, tokens: int) -> List[List[float]]:
+        response = raw.parse()
+        self.scheduler.update(raw.headers, tokens, response.usage.prompt_tokens if response.usage else None)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _embed_batch(self, inputs: List[str], tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(tokens, self.priority)
+            try:
+                raw = self.client.embeddings.with_raw_response.create(model=self.model, input=inputs)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+                continue
+            return self._finish(raw, tokens)
+
+    async def _aembed_batch(self, inputs: List[str], tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            # The scheduler blocks, so waiting for it happens in a thread
+            await asyncio.to_thread(self.scheduler.acquire, tokens, self.priority)
+            try:
+                raw = await self.async_client.embeddings.with_raw_response.create(model=self.model, input=inputs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                continue
+            return self._finish(raw, tokens)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        inputs, token_counts = self._prepare(texts)
+        vectors = []
+        for batch in pack_batches(token_counts):
+            vectors.extend(self._embed_batch([inputs[i] for i in batch], sum(token_counts[i] for i in batch)))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        inputs, token_counts = self._prepare(texts)
+        vectors = []
+        for batch in pack_batches(token_counts):
+            vectors.extend(await self._aembed_batch([inputs[i] for i in batch], sum(token_counts[i] for i in batch)))
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
@@ -0,0 +1,44 @@
+import os
+import hashlib
+
+# Embedding model used for articles and search queries, unless EMBEDDING_MODEL
+# is set. The blog_articles vector columns have 1536 dimensions, so a model
+# with a different size also needs a migration of the columns.
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+def embedding_model_name():
+    # Read on every call, so that a .env loaded by the script is respected
+    return os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+
+def embedding_version(model=None):
+    """Identify the model and settings that produced an embedding."""
+    return f"{model or embedding_model_name()}:{EMBEDDING_DIMENSIONS}"
+
+def content_hash(content, summary):
+    """Hash the embedded texts of an article to detect changed content.
+
+    Must match the SQL expression CONTENT_HASH_SQL.
+    """
+    return hashlib.sha256(f"{content}\n{summary}".encode("utf-8")).hexdigest()
+
+# Same hash as content_hash, computed by PostgreSQL
+CONTENT_HASH_SQL = "encode(sha256(convert_to(content || E'\\n' || summary, 'UTF8')), 'hex')"
+
+def get_embeddings(model=None, priority=None):
+    """Create the embeddings model.
+
+    Requests of all embeddings models of the process share one rate limit
+    scheduler. Searches should pass priority=INTERACTIVE (from rate_limit),
+    so that they are not queued behind bulk ingestion.
+    """
+    # Imported here, as LangChain takes long to import and most callers of
+    # this module only need the version and hash helpers
+    from embedding_client import RateLimitedEmbeddings
+    from rate_limit import BULK
+
+    return RateLimitedEmbeddings(
+        model=model or embedding_model_name(),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        priority=BULK if priority is None else priority
+    )
@@ -1,75 +1,430 @@
-import os
-from langchain_openai import OpenAIEmbeddings
-from models.database import SessionLocal
-from models.blog_article import BlogArticle
+from embedding_model import get_embeddings
+from models.database import SessionLocal, AsyncSessionLocal, to_pgvector
+from search_cache import create_search_cache
+from rate_limit import INTERACTIVE
+from partitions import season_of, season_start
 from sqlalchemy import text
 from dotenv import load_dotenv
-import numpy as np
+from datetime import date, datetime
+import asyncio
+import argparse
 
-def find_similar_article():
+# Query to find the most similar articles using cosine distance.
+# Each embedding column is searched on its own, so that PostgreSQL can use its
+# HNSW index (per partition); the candidates of both are then scored on both
+# columns, and only the best article of each near-duplicate cluster is
+# returned. {window} restricts the dates, which prunes the partitions of the
+# seasons outside of it.
+SIMILAR_ARTICLES_SQL = """
+    WITH candidates AS (
+        (
+            SELECT id, date
+            FROM blog_articles
+            WHERE content_embedding IS NOT NULL{window}
+            ORDER BY content_embedding <=> CAST(:embedding AS vector)
+            LIMIT :candidates
+        )
+        UNION
+        (
+            SELECT id, date
+            FROM blog_articles
+            WHERE summary_embedding IS NOT NULL{window}
+            ORDER BY summary_embedding <=> CAST(:embedding AS vector)
+            LIMIT :candidates
+        )
+    ),
+    scored AS (
+        SELECT
+            a.id,
+            a.title,
+            a.url,
+            a.date,
+            a.content,
+            a.summary,
+            a.cluster_id,
+            (a.content_embedding <=> CAST(:embedding AS vector)) as content_similarity,
+            (a.summary_embedding <=> CAST(:embedding AS vector)) as summary_similarity
+        FROM
+            candidates c
+            JOIN blog_articles a ON a.id = c.id AND a.date = c.date
+    ),
+    best_per_cluster AS (
+        SELECT DISTINCT ON (COALESCE(cluster_id, url)) *
+        FROM scored
+        ORDER BY COALESCE(cluster_id, url), LEAST(content_similarity, summary_similarity)
+    )
+    SELECT *
+    FROM best_per_cluster
+    ORDER BY LEAST(content_similarity, summary_similarity)
+    LIMIT :limit
+"""
+
+# Query to find the chunks closest to an embedding with the HNSW index on
+# article_chunks. The inner ORDER BY ... LIMIT is what lets PostgreSQL use the
+# index; grouping by article happens afterwards on the candidates.
+# {window} restricts the candidates by the article date copied to each chunk.
+# The HNSW scan itself still covers the chunks of all seasons and filters what
+# it finds, see set_search_options.
+SIMILAR_CHUNKS_SQL = """
+    WITH nearest AS (
+        SELECT
+            c.article_id,
+            c.chunk_index,
+            c.content,
+            (c.embedding <=> CAST(:embedding AS vector)) as distance
+        FROM
+            article_chunks c
+        WHERE
+            c.embedding IS NOT NULL{window}
+        ORDER BY c.embedding <=> CAST(:embedding AS vector)
+        LIMIT :candidates
+    )
+    SELECT
+        a.id,
+        a.title,
+        a.url,
+        a.date,
+        a.summary,
+        a.cluster_id,
+        n.chunk_index,
+        n.content as chunk,
+        n.distance
+    FROM
+        nearest n
+        JOIN blog_articles a ON a.id = n.article_id
+    ORDER BY n.distance
+"""
+
+# Query to find the articles containing the words of a search text. The
+# expression matches the GIN index ix_blog_articles_fulltext of each partition,
+# and {window} prunes the partitions like for the similarity search.
+KEYWORD_ARTICLES_SQL = """
+    SELECT
+        a.id,
+        a.title,
+        a.url,
+        a.date,
+        a.summary,
+        ts_rank(to_tsvector('german', a.title || ' ' || a.content), q.query) as rank
+    FROM
+        blog_articles a,
+        websearch_to_tsquery('german', :query) q(query)
+    WHERE
+        to_tsvector('german', a.title || ' ' || a.content) @@ q.query{window}
+    ORDER BY rank DESC
+    LIMIT :limit
+"""
+
+# Seasons searched by recency-first searches, widened until enough articles
+# are found; the last attempt searches all articles
+RECENT_SEASONS = (1, 2, 4)
+
+def _window(column, date_from, date_to):
+    """Return the conditions restricting column to [date_from, date_to)."""
+    conditions = ""
+    if date_from is not None:
+        conditions += f" AND {column} >= :date_from"
+    if date_to is not None:
+        conditions += f" AND {column} < :date_to"
+    return conditions
+
+def _window_params(params, date_from, date_to):
+    if date_from is not None:
+        params["date_from"] = date_from
+    if date_to is not None:
+        params["date_to"] = date_to
+    return params
+
+def similar_articles_query(date_from=None, date_to=None):
+    return text(SIMILAR_ARTICLES_SQL.format(window=_window("date", date_from, date_to)))
+
+def similar_chunks_query(date_from=None, date_to=None):
+    return text(SIMILAR_CHUNKS_SQL.format(window=_window("c.article_date", date_from, date_to)))
+
+def keyword_articles_query(date_from=None, date_to=None):
+    return text(KEYWORD_ARTICLES_SQL.format(window=_window("a.date", date_from, date_to)))
+
+SIMILAR_ARTICLES_QUERY = similar_articles_query()
+SIMILAR_CHUNKS_QUERY = similar_chunks_query()
+
+def recent_windows(today=None):
+    """Yield the start dates of the widening recency-first windows, None for all articles."""
+    current = season_of(today or date.today())
+    for seasons in RECENT_SEASONS:
+        yield season_start(current - seasons + 1)
+    yield None
+
+# Candidates fetched per requested article, from each embedding column for
+# articles and as chunks for chunk searches. The HNSW index returns at most
+# hnsw.ef_search rows, so it is raised to the number of candidates.
+ARTICLE_CANDIDATES_PER_RESULT = 10
+CHUNK_CANDIDATES_PER_ARTICLE = 20
+MAX_EF_SEARCH = 1000
+SET_EF_SEARCH_QUERY = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+
+# An HNSW scan returns its ef_search nearest rows before a WHERE clause
+# filters them, which leaves few rows for a narrow date window. pgvector 0.8
+# and later can continue the scan until enough rows pass the filter.
+SET_ITERATIVE_SCAN_QUERY = text("""
+    SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)
+    FROM pg_extension
+    WHERE extname = 'vector' AND string_to_array(extversion, '.')::int[] >= ARRAY[0, 8]
+""")
+
+def _search_params(embedding, limit, candidates_per_result):
+    candidates = min(limit * candidates_per_result, MAX_EF_SEARCH)
+    return {"ef_search": str(max(candidates, 40))}, {"embedding": to_pgvector(embedding), "candidates": candidates}
+
+def _search_statements(ef_search, date_from, date_to):
+    """Return the statements and parameters setting up the index scans of a search."""
+    statements = [(SET_EF_SEARCH_QUERY, ef_search)]
+    if date_from is not None or date_to is not None:
+        statements.append((SET_ITERATIVE_SCAN_QUERY, {}))
+    return statements
+
+def set_search_options(db, ef_search, date_from=None, date_to=None):
+    """Size the HNSW scans of the current transaction for a search.
+
+    Windowed searches also turn on iterative scans where pgvector supports
+    them; with older versions, a window that few of the nearest chunks or
+    articles fall into may return fewer results than asked for.
+    """
+    for statement, params in _search_statements(ef_search, date_from, date_to):
+        db.execute(statement, params)
+
+async def set_search_options_async(db, ef_search, date_from=None, date_to=None):
+    """Size the HNSW scans of the current transaction using an async session."""
+    for statement, params in _search_statements(ef_search, date_from, date_to):
+        await db.execute(statement, params)
+
+def group_chunks(rows, limit, chunks_per_article=3):
+    """Group chunk rows (ordered by distance) into the best articles.
+
+    Articles of the same near-duplicate cluster count as one. Each article
+    keeps its closest chunks, and articles are ranked by their best chunk.
+    """
+    articles = {}
+    for row in rows:
+        key = row.cluster_id or row.url
+        article = articles.get(key)
+        if article is None:
+            if len(articles) >= limit:
+                continue
+            article = articles[key] = {
+                "id": row.id,
+                "title": row.title,
+                "url": row.url,
+                "date": row.date,
+                "summary": row.summary,
+                "distance": row.distance,
+                "chunks": [],
+            }
+        elif article["id"] != row.id:
+            # Chunks of another article of the same cluster
+            continue
+        if len(article["chunks"]) < chunks_per_article:
+            article["chunks"].append({"chunk_index": row.chunk_index, "content": row.chunk, "distance": row.distance})
+    return list(articles.values())
+
+def search_similar_chunks(db, embedding, limit=1, chunks_per_article=3, date_from=None, date_to=None):
+    """Return the articles with the chunks closest to an embedding, best first.
+
+    With date_from and/or date_to, only articles from date_from (inclusive)
+    to date_to (exclusive) are searched.
+    """
+    ef_search, params = _search_params(embedding, limit, CHUNK_CANDIDATES_PER_ARTICLE)
+    set_search_options(db, ef_search, date_from, date_to)
+    query = similar_chunks_query(date_from, date_to)
+    rows = db.execute(query, _window_params(params, date_from, date_to)).fetchall()
+    return group_chunks(rows, limit, chunks_per_article)
+
+async def search_similar_chunks_async(db, embedding, limit=1, chunks_per_article=3, date_from=None, date_to=None):
+    """Return the articles with the chunks closest to an embedding using an async session."""
+    ef_search, params = _search_params(embedding, limit, CHUNK_CANDIDATES_PER_ARTICLE)
+    await set_search_options_async(db, ef_search, date_from, date_to)
+    query = similar_chunks_query(date_from, date_to)
+    result = await db.execute(query, _window_params(params, date_from, date_to))
+    return group_chunks(result.fetchall(), limit, chunks_per_article)
+
+def search_similar_articles(db, embedding, limit=1, date_from=None, date_to=None):
+    """Return the articles closest to an embedding, optionally only those from date_from to date_to."""
+    ef_search, params = _search_params(embedding, limit, ARTICLE_CANDIDATES_PER_RESULT)
+    params["limit"] = limit
+    set_search_options(db, ef_search, date_from, date_to)
+    query = similar_articles_query(date_from, date_to)
+    return db.execute(query, _window_params(params, date_from, date_to)).fetchall()
+
+async def search_similar_articles_async(db, embedding, limit=1, date_from=None, date_to=None):
+    """Return the articles closest to an embedding using an async session."""
+    ef_search, params = _search_params(embedding, limit, ARTICLE_CANDIDATES_PER_RESULT)
+    params["limit"] = limit
+    await set_search_options_async(db, ef_search, date_from, date_to)
+    query = similar_articles_query(date_from, date_to)
+    result = await db.execute(query, _window_params(params, date_from, date_to))
+    return result.fetchall()
+
+def search_articles_by_keywords(db, query, limit=1, date_from=None, date_to=None):
+    """Return the articles containing the words of a search text, best ranked first.
+
+    The query uses the web search syntax of PostgreSQL, e.g. quoted phrases
+    and -word to exclude a word.
+    """
+    params = _window_params({"query": query, "limit": limit}, date_from, date_to)
+    return db.execute(keyword_articles_query(date_from, date_to), params).fetchall()
+
+def search_recent_first(db, embedding, limit=1, use_chunks=False):
+    """Search the current season first and widen to older seasons until limit articles are found.
+
+    Most searches are about recent news. Article searches then only scan the
+    partitions of the last seasons; chunk searches filter the chunks of all
+    seasons by date (see SIMILAR_CHUNKS_SQL).
+    """
+    search = search_similar_chunks if use_chunks else search_similar_articles
+    for date_from in recent_windows():
+        results = search(db, embedding, limit=limit, date_from=date_from)
+        if len(results) >= limit or date_from is None:
+            return results
+
+async def search_recent_first_async(db, embedding, limit=1, use_chunks=False):
+    """Search like search_recent_first using an async session."""
+    search = search_similar_chunks_async if use_chunks else search_similar_articles_async
+    for date_from in recent_windows():
+        results = await search(db, embedding, limit=limit, date_from=date_from)
+        if len(results) >= limit or date_from is None:
+            return results
+
+async def find_similar_articles_async(query, limit=1, embeddings=None, cache=None):
+    """Embed a query and search for it without blocking the event loop.
+
+    Many searches can run concurrently on the async engine's connection pool.
+    With a SemanticCache, queries similar to a recent one skip the database.
+    The cache talks to the database with blocking calls, so it is used from
+    the default executor.
+    """
+    embeddings = embeddings or get_embeddings(priority=INTERACTIVE)
+    input_embedding = await embeddings.aembed_query(query)
+    loop = asyncio.get_running_loop()
+    if cache is not None:
+        results = await loop.run_in_executor(None, cache.lookup, input_embedding, limit)
+        if results is not None:
+            return results
+    async with AsyncSessionLocal() as db:
+        results = await search_similar_articles_async(db, input_embedding, limit)
+    if cache is not None:
+        await loop.run_in_executor(None, cache.store, input_embedding, limit, results)
+    return results
+
+def print_article(result):
+    print("\n=== Most Similar Article ===")
+    print(f"Title: {result.title}")
+    print(f"Date: {result.date}")
+    print(f"URL: {result.url}")
+    print(f"Content Similarity: {1 - result.content_similarity:.4f}")
+    print(f"Summary Similarity: {1 - result.summary_similarity:.4f}")
+    print("\n=== Summary ===")
+    print(result.summary)
+    print("\n=== Full Content ===")
+    print(result.content)
+
+def print_chunk_match(match):
+    print("\n=== Most Similar Article ===")
+    print(f"Title: {match['title']}")
+    print(f"Date: {match['date']}")
+    print(f"URL: {match['url']}")
+    print(f"Similarity: {1 - match['distance']:.4f}")
+    for chunk in match["chunks"]:
+        print(f"\n=== Passage {chunk['chunk_index'] + 1} (similarity {1 - chunk['distance']:.4f}) ===")
+        print(chunk["content"])
+
+def print_keyword_match(result):
+    print("\n=== Matching Article ===")
+    print(f"Title: {result.title}")
+    print(f"Date: {result.date}")
+    print(f"URL: {result.url}")
+    print(f"Rank: {result.rank:.4f}")
+    print("\n=== Summary ===")
+    print(result.summary)
+
+def find_similar_article(use_chunks=False, limit=1, use_cache=True, date_from=None, date_to=None, recent=False,
+                         keywords=False):
     # Load environment variables
     load_dotenv()
-    
+
     # Initialize the embeddings model
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
-    
-    # Get user input
-    user_input = input("Enter your search text: ")
-    
-    # Create embedding for user input
-    input_embedding = embeddings.embed_query(user_input)
-    
+    embeddings = get_embeddings(priority=INTERACTIVE)
+
+    # Similar searches are answered from the cache until articles change
+    cache = create_search_cache() if use_cache else None
+    # Results are only reused for searches with the same options
+    mode = f"{'chunks' if use_chunks else 'articles'}:{date_from}:{date_to}:{recent}"
+    show = print_chunk_match if use_chunks else print_article
+
     # Create a database session
     db = SessionLocal()
-    
+
     try:
-        # Convert the embedding to a string representation for PostgreSQL
-        embedding_str = ','.join(map(str, input_embedding))
-        
-        # Query to find the most similar article using cosine similarity
-        # We'll search in both content and summary embeddings
-        query = text(f"""
-            SELECT 
-                id, 
-                title, 
-                url, 
-                date, 
-                content, 
-                summary,
-                (content_embedding <=> ARRAY[{embedding_str}]::vector) as content_similarity,
-                (summary_embedding <=> ARRAY[{embedding_str}]::vector) as summary_similarity
-            FROM 
-                blog_articles
-            ORDER BY 
-                LEAST((content_embedding <=> ARRAY[{embedding_str}]::vector), (summary_embedding <=> ARRAY[{embedding_str}]::vector))
-            LIMIT 1
-        """)
-        
-        # Execute the query
-        result = db.execute(query).fetchone()
-        
-        if result:
-            print("\n=== Most Similar Article ===")
-            print(f"Title: {result.title}")
-            print(f"Date: {result.date}")
-            print(f"URL: {result.url}")
-            print(f"Content Similarity: {1 - result.content_similarity:.4f}")
-            print(f"Summary Similarity: {1 - result.summary_similarity:.4f}")
-            print("\n=== Summary ===")
-            print(result.summary)
-            print("\n=== Full Content ===")
-            print(result.content)
-        else:
-            print("No articles found in the database.")
-    
+        while True:
+            # Get user input
+            user_input = input("\nEnter your search text (empty to quit): ")
+            if not user_input.strip():
+                break
+
+            # Keyword searches need neither embeddings nor the cache
+            if keywords:
+                results = search_articles_by_keywords(db, user_input, limit=limit, date_from=date_from, date_to=date_to)
+                db.rollback()
+                for result in results:
+                    print_keyword_match(result)
+                if not results:
+                    print("No articles found in the database.")
+                continue
+
+            # Create embedding for user input
+            input_embedding = embeddings.embed_query(user_input)
+
+            results = cache.lookup(input_embedding, limit, mode) if cache is not None else None
+            if results is not None:
+                print("(cached results)")
+            else:
+                # Execute the query
+                if recent:
+                    results = search_recent_first(db, input_embedding, limit=limit, use_chunks=use_chunks)
+                elif use_chunks:
+                    results = search_similar_chunks(db, input_embedding, limit=limit, date_from=date_from, date_to=date_to)
+                else:
+                    results = search_similar_articles(db, input_embedding, limit=limit, date_from=date_from, date_to=date_to)
+                db.rollback()  # end the read transaction, so the next search sees new articles
+                if cache is not None:
+                    cache.store(input_embedding, limit, results, mode)
+
+            for result in results:
+                show(result)
+            if not results:
+                print("No articles found in the database.")
+
     except Exception as e:
         print(f"Error finding similar article: {str(e)}")
-    
+
     finally:
         db.close()
+        if cache is not None:
+            cache.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the articles most similar to a search text.")
+    parser.add_argument("--chunks", action="store_true", help="Search article chunks and show the matching passages")
+    parser.add_argument("--limit", type=int, default=1, help="Number of articles to show")
+    parser.add_argument("--no-cache", action="store_true", help="Search the database for every query")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only search articles from this date on (YYYY-MM-DD)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only search articles before this date (YYYY-MM-DD)")
+    parser.add_argument("--recent", action="store_true",
+                        help="Search the current season first and older seasons only if too few articles are found")
+    parser.add_argument("--keywords", action="store_true",
+                        help="Search the words of the search text with the full-text index instead of by similarity")
+    args = parser.parse_args(argv)
+
+    find_similar_article(args.chunks, args.limit, use_cache=not args.no_cache,
+                         date_from=args.since, date_to=args.until, recent=args.recent, keywords=args.keywords)
 
 if __name__ == "__main__":
-    find_similar_article() 
\ No newline at end of file
+    main()
@@ -1,5 +1,4 @@
 import psycopg2
-import uuid
 
 # Database connection parameters
 db_params = {
@@ -10,25 +9,35 @@ db_params = {
     'port': '5432'
 }
 
-# Connect to the database
-conn = psycopg2.connect(**db_params)
-cur = conn.cursor()
+def create_player_profiles_table(cur):
+    """Create the PLAYER_PROFILES table and add columns missing in older versions."""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS PLAYER_PROFILES (
+            ID UUID PRIMARY KEY,
+            FIRST_NAME VARCHAR(255),
+            NAME VARCHAR(255),
+            PROFILE TEXT
+        )
+    ''')
+    cur.execute('ALTER TABLE PLAYER_PROFILES ADD COLUMN IF NOT EXISTS URL VARCHAR(1000)')
+    cur.execute('ALTER TABLE PLAYER_PROFILES ADD COLUMN IF NOT EXISTS DETAILS JSONB')
 
-# Create the PLAYER_PROFILES table
-cur.execute('''
-    CREATE TABLE IF NOT EXISTS PLAYER_PROFILES (
-        ID UUID PRIMARY KEY,
-        FIRST_NAME VARCHAR(255),
-        NAME VARCHAR(255),
-        PROFILE TEXT
-    )
-''')
+def init_db():
+    # Connect to the database
+    conn = psycopg2.connect(**db_params)
+    cur = conn.cursor()
 
-# Commit the transaction
-conn.commit()
+    # Create the PLAYER_PROFILES table
+    create_player_profiles_table(cur)
 
-# Close the cursor and connection
-cur.close()
-conn.close()
+    # Commit the transaction
+    conn.commit()
 
-print("Table PLAYER_PROFILES created successfully.") 
\ No newline at end of file
+    # Close the cursor and connection
+    cur.close()
+    conn.close()
+
+    print("Table PLAYER_PROFILES created successfully.")
+
+if __name__ == "__main__":
+    init_db()
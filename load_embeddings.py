@@ -1,65 +1,293 @@
 import json
-import os
-from datetime import datetime
-from langchain_openai import OpenAIEmbeddings
-from models.database import SessionLocal
+import asyncio
+import argparse
+from contextlib import nullcontext
+from embedding_model import get_embeddings, embedding_version, content_hash
+from models.database import SessionLocal, AsyncSessionLocal
 from models.blog_article import BlogArticle
 from dotenv import load_dotenv
+from sqlalchemy import select, update
+from dedup import DuplicateIndex, DEDUP_MODE
+from article_parser import parse_article_date
+from chunking import build_article_chunks, embed_chunks, aembed_chunks
+from partitions import ensure_season_partitions
 
-def load_embeddings():
+# Source JSON file written by crawl_blog.py
+SOURCE_FILE = "blog_articles/vfb_articles_20250414_193539.json"
+
+# Maximum number of batches embedded at the same time when loading asynchronously
+EMBEDDING_CONCURRENCY = 8
+
+# Articles embedded and committed together
+LOAD_BATCH_SIZE = 16
+
+def create_blog_article(article, content_embedding, summary_embedding, cluster_id=None):
+    return BlogArticle(
+        title=article['title'],
+        url=article['url'],
+        date=parse_article_date(article['date']),
+        content=article['content'],
+        summary=article['summary'],
+        content_embedding=content_embedding,
+        summary_embedding=summary_embedding,
+        cluster_id=cluster_id,
+        embedding_version=embedding_version() if content_embedding is not None else None,
+        content_hash=content_hash(article['content'], article['summary'])
+    )
+
+def check_duplicate(duplicates, article, dedup_mode):
+    """Assign the article to a near-duplicate cluster before it is embedded.
+
+    Returns the cluster ID and whether the article still needs embeddings.
+    """
+    if duplicates is None:
+        return None, True
+    cluster_id, duplicate_of = duplicates.check(article['url'], article['content'])
+    if duplicate_of:
+        action = "Skipping" if dedup_mode == "skip" else "Flagging"
+        print(f"{action} near-duplicate {article['url']} of {duplicate_of}")
+        return cluster_id, False
+    return cluster_id, True
+
+def embed_batch(embeddings, batch):
+    """Embed contents and summaries of a batch of (article, cluster ID, needs embeddings) in one go."""
+    embedded = [article for article, _, needs_embeddings in batch if needs_embeddings]
+    vectors = embeddings.embed_documents(
+        [article['content'] for article in embedded] + [article['summary'] for article in embedded]
+    )
+    return dict(zip(
+        (article['url'] for article in embedded),
+        zip(vectors[:len(embedded)], vectors[len(embedded):])
+    ))
+
+async def aembed_batch(embeddings, batch):
+    """Embed a batch like embed_batch without blocking the event loop."""
+    embedded = [article for article, _, needs_embeddings in batch if needs_embeddings]
+    vectors = await embeddings.aembed_documents(
+        [article['content'] for article in embedded] + [article['summary'] for article in embedded]
+    )
+    return dict(zip(
+        (article['url'] for article in embedded),
+        zip(vectors[:len(embedded)], vectors[len(embedded):])
+    ))
+
+def create_batch_articles(batch, vectors):
+    return [
+        create_blog_article(article, *vectors.get(article['url'], (None, None)), cluster_id)
+        for article, cluster_id, _ in batch
+    ]
+
+def redated_articles(known_dates, articles):
+    """Return (url, stored date, new date) of the known articles that now carry another date.
+
+    URLs are unique across the partitions of blog_articles (see the
+    article_urls table), so such an article is moved to its new date
+    instead of being loaded again.
+    """
+    moves = []
+    for article in articles:
+        if article['url'] not in known_dates:
+            continue
+        try:
+            day = parse_article_date(article['date'])
+        except ValueError:
+            continue
+        if day != known_dates[article['url']]:
+            moves.append((article['url'], known_dates[article['url']], day))
+    return moves
+
+def redate_article(url, stored_date, new_date):
+    """Return the update moving an article to its new date, and with that to its season's partition."""
+    return (
+        update(BlogArticle)
+        .where(BlogArticle.url == url, BlogArticle.date == stored_date)
+        .values(date=new_date)
+    )
+
+def cluster_new_articles(known_dates, articles, dedup_mode, duplicates=None):
+    """Return (article, cluster ID, needs embeddings) for the articles to load.
+
+    Articles already in the database (e.g. from an interrupted run) are left
+    out, as are near-duplicates with dedup_mode "skip". Without a
+    DuplicateIndex, no article is checked for near-duplicates.
+    """
+    articles = [article for article in articles if article['url'] not in known_dates]
+    clusters = [check_duplicate(duplicates, article, dedup_mode) for article in articles]
+    pending = []
+    for article, (cluster_id, needs_embeddings) in zip(articles, clusters):
+        if needs_embeddings or dedup_mode != "skip":
+            pending.append((article, cluster_id, needs_embeddings))
+        else:
+            duplicates.discard([article['url']])
+    return pending
+
+def record_duplicates(duplicates, batch, loaded):
+    """Save the near-duplicate checks of a loaded batch, or discard those of a failed one.
+
+    Discarded articles are checked again when they are loaded the next time.
+    """
+    if duplicates is None:
+        return
+    keys = [article['url'] for article, _, _ in batch]
+    if loaded:
+        duplicates.save(keys)
+    else:
+        duplicates.discard(keys)
+
+def article_dates(pending):
+    """Return the dates of the clustered articles, for creating their seasons' partitions."""
+    dates = []
+    for article, _, _ in pending:
+        try:
+            dates.append(parse_article_date(article["date"]))
+        except ValueError as e:
+            # The article fails to load in its batch as well
+            print(f"Cannot create the partition of {article['url']}: {str(e)}")
+    return dates
+
+def load_embeddings(source_file=SOURCE_FILE, dedup_mode=DEDUP_MODE, batch_size=LOAD_BATCH_SIZE):
+    """Embed and load the articles of a crawler JSON file.
+
+    Each batch of articles is committed on its own, so a failed batch does
+    not lose the ones loaded before it, and running the script again only
+    loads the missing articles.
+    """
     # Load environment variables
     load_dotenv()
-    
+
     # Initialize the embeddings model
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
-    
+    embeddings = get_embeddings()
+
     # Read the source JSON file
-    source_file = "blog_articles/vfb_articles_20250414_193539.json"
     with open(source_file, 'r', encoding='utf-8') as f:
         articles = json.load(f)
-    
+
     # Create a database session
     db = SessionLocal()
-    
+    duplicates = DuplicateIndex() if dedup_mode != "off" else None
+
+    loaded = 0
+    failed = 0
     try:
-        # Process each article
-        for article in articles:
-            # Generate embeddings for content and summary
-            content_embedding = embeddings.embed_query(article['content'])
-            summary_embedding = embeddings.embed_query(article['summary'])
-            
-            # Parse the date string to datetime object
-            # The date format is like "Club, 14. April 2025"
-            date_str = article['date'].split(', ')[1]  # Get "14. April 2025"
-            date_obj = datetime.strptime(date_str, '%d. %B %Y')
-            
-            # Create a new BlogArticle instance
-            blog_article = BlogArticle(
-                title=article['title'],
-                url=article['url'],
-                date=date_obj,
-                content=article['content'],
-                summary=article['summary'],
-                content_embedding=content_embedding,
-                summary_embedding=summary_embedding
-            )
-            
-            # Add to database
-            db.add(blog_article)
-        
-        # Commit all changes
+        # Near-duplicates are detected before any embedding request
+        known_dates = dict(db.execute(select(BlogArticle.url, BlogArticle.date)).tuples())
+        pending = cluster_new_articles(known_dates, articles, dedup_mode, duplicates)
+        moves = redated_articles(known_dates, articles)
+        ensure_season_partitions(db, article_dates(pending) + [day for _, _, day in moves])
+        for move in moves:
+            db.execute(redate_article(*move))
         db.commit()
-        print(f"Successfully loaded {len(articles)} articles with embeddings into the database")
-        
+        if moves:
+            print(f"Moved {len(moves)} articles to their new dates")
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                blog_articles = create_batch_articles(batch, embed_batch(embeddings, batch))
+                db.add_all(blog_articles)
+
+                # Chunks reference their article, so the articles need IDs first
+                db.flush()
+                chunks = build_article_chunks([
+                    blog_article for blog_article in blog_articles if blog_article.content_embedding is not None
+                ])
+                db.add_all(embed_chunks(embeddings, chunks))
+                db.commit()
+                record_duplicates(duplicates, batch, loaded=True)
+                loaded += len(batch)
+                print(f"Loaded {loaded} of {len(pending)} articles")
+
+            except Exception as e:
+                print(f"Error loading articles {start + 1}-{start + len(batch)}: {str(e)}")
+                db.rollback()
+                record_duplicates(duplicates, batch, loaded=False)
+                failed += len(batch)
+
+        print(f"Successfully loaded {loaded} articles with embeddings into the database")
+        if failed:
+            print(f"Failed to load {failed} articles, run again to retry them")
+
     except Exception as e:
         print(f"Error loading embeddings: {str(e)}")
         db.rollback()
-    
+
     finally:
         db.close()
+        if duplicates is not None:
+            duplicates.close()
+
+async def load_embeddings_async(source_file=SOURCE_FILE, concurrency=EMBEDDING_CONCURRENCY,
+                                dedup_mode=DEDUP_MODE, batch_size=LOAD_BATCH_SIZE):
+    """Load articles like load_embeddings, embedding several batches at once.
+
+    Up to concurrency batches are embedded at the same time, and each batch
+    is written and committed through the async engine once it is embedded.
+    """
+    load_dotenv()
+
+    embeddings = get_embeddings()
+
+    with open(source_file, 'r', encoding='utf-8') as f:
+        articles = json.load(f)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    # Near-duplicate checks are saved once their article is loaded
+    with DuplicateIndex() if dedup_mode != "off" else nullcontext() as duplicates:
+        # Cluster all articles up front, so that no duplicate is embedded
+        async with AsyncSessionLocal() as db:
+            known_dates = dict((await db.execute(select(BlogArticle.url, BlogArticle.date))).tuples())
+            pending = cluster_new_articles(known_dates, articles, dedup_mode, duplicates)
+            moves = redated_articles(known_dates, articles)
+            await db.run_sync(ensure_season_partitions, article_dates(pending) + [day for _, _, day in moves])
+            for move in moves:
+                await db.execute(redate_article(*move))
+            await db.commit()
+            if moves:
+                print(f"Moved {len(moves)} articles to their new dates")
+
+        async def load_batch(start):
+            batch = pending[start:start + batch_size]
+            async with semaphore:
+                async with AsyncSessionLocal() as db:
+                    try:
+                        blog_articles = create_batch_articles(batch, await aembed_batch(embeddings, batch))
+                        db.add_all(blog_articles)
+
+                        # Chunks reference their article, so the articles need IDs first
+                        await db.flush()
+                        chunks = build_article_chunks([
+                            blog_article for blog_article in blog_articles if blog_article.content_embedding is not None
+                        ])
+                        db.add_all(await aembed_chunks(embeddings, chunks))
+                        await db.commit()
+                        record_duplicates(duplicates, batch, loaded=True)
+                        return len(batch)
+
+                    except Exception as e:
+                        print(f"Error loading articles {start + 1}-{start + len(batch)}: {str(e)}")
+                        await db.rollback()
+                        record_duplicates(duplicates, batch, loaded=False)
+                        return 0
+
+        loaded = sum(await asyncio.gather(*(load_batch(start) for start in range(0, len(pending), batch_size))))
+        print(f"Successfully loaded {loaded} articles with embeddings into the database")
+        if loaded < len(pending):
+            print(f"Failed to load {len(pending) - loaded} articles, run again to retry them")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed the articles of a crawler JSON file and load them into the database.")
+    parser.add_argument("source_file", nargs="?", default=SOURCE_FILE, help=f"Crawler JSON file (default: {SOURCE_FILE})")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Embed several articles at once through the async engine")
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY, help="Batches embedded at the same time with --async")
+    parser.add_argument("--batch-size", type=int, default=LOAD_BATCH_SIZE, help="Articles embedded and committed together")
+    parser.add_argument("--dedup-mode", choices=["flag", "skip", "off"], default=DEDUP_MODE,
+                        help="Store near-duplicates without embeddings (flag), drop them (skip) or embed everything (off)")
+    args = parser.parse_args(argv)
+
+    if args.use_async:
+        asyncio.run(load_embeddings_async(args.source_file, args.concurrency, args.dedup_mode, args.batch_size))
+    else:
+        load_embeddings(args.source_file, args.dedup_mode, args.batch_size)
 
 if __name__ == "__main__":
-    load_embeddings() 
\ No newline at end of file
+    main()
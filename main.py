@@ -1,39 +1,156 @@
-import requests
-from bs4 import BeautifulSoup
-import os
 import re
+import uuid
+import asyncio
+import aiohttp
+import psycopg2
+from psycopg2.extras import execute_values, Json
+from lxml import html as lxml_html
+from typing import Any, Dict, List, Optional, Tuple
+from init_db import db_params, create_player_profiles_table
 
 # Base URL for the VfB website
 base_url = "https://www.vfb.de"
 
-# Get the main page
-response = requests.get("https://www.vfb.de/de/1893/aktuell/neues/")
-soup = BeautifulSoup(response.text, "lxml")
-
-# Create a directory to store player profiles if it doesn't exist
-if not os.path.exists("player_profiles"):
-    os.makedirs("player_profiles")
-
-# Find all links that match the player profile pattern
-for link in soup.find_all("a"):
-    href = link.get("href")
-    if href and href.startswith("/de/vfb/profis/kader"):
-        # Extract player name from the URL
-        match = re.search(r'/kader/\d+/([^/]+)/spielerprofil/', href)
-        if match:
-            player_name = match.group(1)
-            player_url = base_url + href
-            
-            # Get the player's profile page
-            try:
-                player_response = requests.get(player_url)
-                player_soup = BeautifulSoup(player_response.text, "lxml")
-                
-                # Save the content to a file
-                file_path = os.path.join("player_profiles", f"{player_name}.txt")
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(player_soup.get_text())
-                print(f"Saved profile for {player_name}")
-            except Exception as e:
-                print(f"Error processing {player_name}: {str(e)}")
+# Page the player profile links are collected from
+START_URL = "https://www.vfb.de/de/1893/aktuell/neues/"
 
+# Maximum number of profile requests in flight at the same time
+MAX_CONCURRENCY = 16
+
+# Timeout in seconds for a single request
+REQUEST_TIMEOUT = 30
+
+PLAYER_LINK_PATTERN = re.compile(r'/kader/\d+/([^/]+)/spielerprofil/')
+
+def extract_player_links(html_content: str) -> List[Tuple[str, str]]:
+    """Return the unique (player slug, profile URL) pairs linked from a page."""
+    document = lxml_html.document_fromstring(html_content)
+    links = {}
+    for href in document.xpath("//a/@href"):
+        if href.startswith("/de/vfb/profis/kader"):
+            # Extract player name from the URL
+            match = PLAYER_LINK_PATTERN.search(href)
+            if match:
+                player_url = base_url + href
+                # The same player is usually linked several times
+                links.setdefault(player_url, match.group(1))
+    return [(player_name, player_url) for player_url, player_name in links.items()]
+
+def element_text(element) -> str:
+    """Return the whitespace-normalized text of an element, keeping words of adjacent blocks apart."""
+    return " ".join(" ".join(element.xpath(".//text()")).split())
+
+def parse_player_profile(html_content: str, player_url: str, player_name: str) -> Dict[str, Any]:
+    """Parse a player profile page into the fields of the PLAYER_PROFILES table."""
+    document = lxml_html.document_fromstring(html_content)
+    for element in document.xpath("//script | //style | //noscript"):
+        element.drop_tree()
+
+    # Full name from the page heading, falling back to the URL slug
+    full_name = ""
+    headings = document.xpath("//h1")
+    if headings:
+        full_name = element_text(headings[0])
+    if not full_name:
+        full_name = " ".join(part.capitalize() for part in player_name.split("-"))
+    first_name, _, name = full_name.partition(" ")
+    if not name:
+        first_name, name = "", first_name
+
+    # Key/value facts such as position, shirt number or date of birth
+    details = {}
+    for term in document.xpath("//dl/dt"):
+        value = term.getnext()
+        if value is not None and value.tag == "dd":
+            details[element_text(term)] = element_text(value)
+    for row in document.xpath("//table//tr"):
+        cells = row.xpath("./th | ./td")
+        if len(cells) == 2:
+            details[element_text(cells[0])] = element_text(cells[1])
+    details.pop("", None)
+
+    main = document.xpath("//main")
+    profile = element_text(main[0] if main else document)
+
+    return {
+        # Derived from the URL so that re-crawling updates the existing row
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, player_url)),
+        "first_name": first_name,
+        "name": name,
+        "profile": profile,
+        "url": player_url,
+        "details": details
+    }
+
+async def fetch_page(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str) -> str:
+    """Fetch a page, limiting the number of concurrent requests."""
+    async with semaphore:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+
+async def fetch_player_profile(session, semaphore, player_name: str, player_url: str) -> Optional[Dict[str, Any]]:
+    try:
+        html_content = await fetch_page(session, semaphore, player_url)
+        profile = parse_player_profile(html_content, player_url, player_name)
+        print(f"Fetched profile for {player_name}")
+        return profile
+    except Exception as e:
+        print(f"Error processing {player_name}: {str(e)}")
+        return None
+
+async def fetch_player_profiles(max_concurrency: int = MAX_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Fetch all player profiles linked from the start page concurrently.
+
+    All requests share one connection pool, so connections to vfb.de are
+    reused instead of being opened for every profile.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Get the main page
+        html_content = await fetch_page(session, semaphore, START_URL)
+        player_links = extract_player_links(html_content)
+        print(f"Found {len(player_links)} player profiles")
+
+        profiles = await asyncio.gather(*(
+            fetch_player_profile(session, semaphore, player_name, player_url)
+            for player_name, player_url in player_links
+        ))
+
+    return [profile for profile in profiles if profile]
+
+def save_player_profiles(profiles: List[Dict[str, Any]]) -> None:
+    """Insert or update all profiles in PLAYER_PROFILES with a single statement."""
+    # A player linked twice would make the upsert update the same row twice
+    rows = list({
+        p["id"]: (p["id"], p["first_name"], p["name"], p["profile"], p["url"], Json(p["details"]))
+        for p in profiles
+    }.values())
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn, conn.cursor() as cur:
+            create_player_profiles_table(cur)
+            execute_values(cur, '''
+                INSERT INTO PLAYER_PROFILES (ID, FIRST_NAME, NAME, PROFILE, URL, DETAILS)
+                VALUES %s
+                ON CONFLICT (ID) DO UPDATE SET
+                    FIRST_NAME = EXCLUDED.FIRST_NAME,
+                    NAME = EXCLUDED.NAME,
+                    PROFILE = EXCLUDED.PROFILE,
+                    URL = EXCLUDED.URL,
+                    DETAILS = EXCLUDED.DETAILS
+            ''', rows, page_size=len(rows))
+        print(f"Saved {len(rows)} player profiles to the database")
+    finally:
+        conn.close()
+
+def crawl_player_profiles():
+    profiles = asyncio.run(fetch_player_profiles())
+    if profiles:
+        save_player_profiles(profiles)
+
+if __name__ == "__main__":
+    crawl_player_profiles()
@@ -0,0 +1,133 @@
+import json
+import math
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rate_limit import TokenBucket
+
+# Default quota of the mock, low enough to hit it within seconds
+MOCK_RPM = 600
+MOCK_TPM = 200000
+
+class MockProvider:
+    """Rate-limited stand-in for the OpenAI embeddings endpoint.
+
+    Returns deterministic unit vectors derived from each input, so the same
+    text always gets the same embedding, and answers like the real API with
+    x-ratelimit-* headers, and with 429 responses once the quota is used up.
+    """
+
+    def __init__(self, rpm=MOCK_RPM, tpm=MOCK_TPM, latency=0.05, error_rate=0.0, dimensions=1536):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.dimensions = dimensions
+        self.lock = threading.Lock()
+        self.stats = {"served": 0, "tokens": 0, "rate_limited": 0, "errors": 0}
+
+    def embed(self, text):
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0, 1) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector]
+
+    def rate_limit_headers(self, now):
+        headers = {}
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            bucket.refill(now)
+            remaining = max(0, int(bucket.level))
+            headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.capacity))
+            headers[f"x-ratelimit-remaining-{kind}"] = str(remaining)
+            headers[f"x-ratelimit-reset-{kind}"] = f"{(bucket.capacity - remaining) / bucket.rate:.3f}s"
+        return headers
+
+    def handle(self, body):
+        """Return the status, headers and payload of an embeddings request."""
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Inputs may be texts or token IDs, texts are estimated at 4 characters per token
+        tokens = sum(len(item) if isinstance(item, list) else max(1, len(item) // 4) for item in inputs)
+
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                self.stats["rate_limited"] += 1
+                headers = self.rate_limit_headers(now)
+                headers["retry-after-ms"] = str(math.ceil(wait * 1000))
+                return 429, headers, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            if random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, {}, {"error": {"message": "Mock server error", "type": "server_error"}}
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            headers = self.rate_limit_headers(now)
+            self.stats["served"] += 1
+            self.stats["tokens"] += tokens
+
+        time.sleep(self.latency)
+        data = []
+        for index, item in enumerate(inputs):
+            vector = self.embed(item if isinstance(item, str) else " ".join(map(str, item)))
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return 200, headers, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+def make_handler(provider):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") not in ("/v1/embeddings", "/embeddings"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            status, headers, payload = provider.handle(body)
+            content = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a rate-limited mock of the OpenAI embeddings API.")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--rpm", type=int, default=MOCK_RPM, help="Requests per minute before answering 429")
+    parser.add_argument("--tpm", type=int, default=MOCK_TPM, help="Tokens per minute before answering 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds to wait before answering")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with a server error")
+    args = parser.parse_args(argv)
+
+    provider = MockProvider(args.rpm, args.tpm, args.latency, args.error_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(provider))
+    print(f"Mock embeddings API on http://127.0.0.1:{args.port}/v1 ({args.rpm} RPM, {args.tpm} TPM)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {provider.stats['served']} requests ({provider.stats['tokens']} tokens), "
+              f"{provider.stats['rate_limited']} rate limited, {provider.stats['errors']} failed")
+
+if __name__ == "__main__":
+    main()
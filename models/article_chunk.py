@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, Index
+from pgvector.sqlalchemy import Vector
+from .database import Base
+
+class ArticleChunk(Base):
+    """A token-bounded piece of an article's content with its own embedding."""
+    __tablename__ = 'article_chunks'
+    __table_args__ = (
+        UniqueConstraint('article_id', 'chunk_index'),
+        Index(
+            'ix_article_chunks_embedding', 'embedding',
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding': 'vector_cosine_ops'}
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # No foreign key, as blog_articles is partitioned; a trigger deletes the
+    # chunks of deleted articles
+    article_id = Column(Integer, nullable=False, index=True)
+    # Date of the article, for date-restricted searches; set by a trigger
+    article_date = Column(DateTime, nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    embedding = Column(Vector(1536))
+    embedding_version = Column(String(100))
+    # Shadow columns filled by backfill_embeddings.py before a model switch
+    embedding_next = Column(Vector(1536))
+    embedding_version_next = Column(String(100))
+
+    def __repr__(self):
+        return f"<ArticleChunk(article_id={self.article_id}, chunk_index={self.chunk_index}, token_count={self.token_count})>"
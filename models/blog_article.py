@@ -1,19 +1,50 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import ARRAY
 from pgvector.sqlalchemy import Vector
 from .database import Base
 
 class BlogArticle(Base):
     __tablename__ = 'blog_articles'
+    # Partitioned by season, see partitions.py. The partition key has to be
+    # part of the primary key and of unique constraints.
+    __table_args__ = (
+        UniqueConstraint('url', 'date', name='blog_articles_url_date_key'),
+        Index(
+            'ix_blog_articles_content_embedding', 'content_embedding',
+            postgresql_using='hnsw',
+            postgresql_ops={'content_embedding': 'vector_cosine_ops'}
+        ),
+        Index(
+            'ix_blog_articles_summary_embedding', 'summary_embedding',
+            postgresql_using='hnsw',
+            postgresql_ops={'summary_embedding': 'vector_cosine_ops'}
+        ),
+        Index(
+            'ix_blog_articles_fulltext', text("to_tsvector('german', title || ' ' || content)"),
+            postgresql_using='gin'
+        ),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(500), nullable=False)
-    url = Column(String(1000), nullable=False, unique=True)
-    date = Column(DateTime, nullable=False)
+    url = Column(String(1000), nullable=False)
+    date = Column(DateTime, primary_key=True)
     content = Column(Text, nullable=False)
     summary = Column(Text, nullable=False)
     content_embedding = Column(Vector(1536))  # OpenAI embeddings are 1536 dimensions
     summary_embedding = Column(Vector(1536))
+    # Near-duplicate cluster (see dedup.py); duplicates are stored without embeddings
+    cluster_id = Column(String(40), index=True)
+    # Model and settings that produced the embeddings (see embedding_model.py)
+    embedding_version = Column(String(100))
+    # Hash of the embedded content and summary, to detect changed articles
+    content_hash = Column(String(64))
+    # Shadow columns written by backfill_embeddings.py and swapped in when it is done
+    content_embedding_next = Column(Vector(1536))
+    summary_embedding_next = Column(Vector(1536))
+    embedding_version_next = Column(String(100))
+    content_hash_next = Column(String(64))
 
     def __repr__(self):
         return f"<BlogArticle(title='{self.title}', url='{self.url}', date='{self.date}')>" 
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from .database import Base
+
+class EmbeddingBackfill(Base):
+    """Progress checkpoint of a re-embedding run towards one embedding version."""
+    __tablename__ = 'embedding_backfills'
+
+    target_version = Column(String(100), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    rows_embedded = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<EmbeddingBackfill(target_version='{self.target_version}', last_id={self.last_id}, finished_at='{self.finished_at}')>"
@@ -0,0 +1,198 @@
+import os
+import gzip
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Directory holding the segment files and the index of the raw page archive
+ARCHIVE_DIR = "page_archive"
+
+# Start a new segment file once the current one exceeds this size
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Kinds of pages stored in the archive
+LISTING = "listing"
+ARTICLE = "article"
+
+# Location of a stored page: (segment number, offset, length, codec)
+Location = Tuple[int, int, int, str]
+
+def default_codec() -> str:
+    """Use zstd when the zstandard package is installed, gzip otherwise."""
+    return "zstd" if zstandard is not None else "gzip"
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=9)
+    raise ValueError(f"Unknown codec: {codec}")
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The archive contains zstd pages, install zstandard to read them")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+def segment_path(archive_dir: str, segment: int) -> str:
+    return os.path.join(archive_dir, f"segment-{segment:06d}.dat")
+
+def read_location(archive_dir: str, location: Location) -> str:
+    """Read a page by its location without opening the index.
+
+    Used by worker processes, which only get the location from the parent.
+    """
+    segment, offset, length, codec = location
+    with open(segment_path(archive_dir, segment), "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    return decompress(data, codec).decode("utf-8")
+
+class PageArchive:
+    """Content-addressed store for raw page sources.
+
+    Pages are compressed individually and appended to segment files, so any
+    page can be read with a single seek. An SQLite index maps content hashes
+    to their position in the segments and URLs to the content hashes seen for
+    them. Identical page sources are stored only once.
+    """
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, segment_size: int = SEGMENT_SIZE, codec: Optional[str] = None):
+        self.archive_dir = archive_dir
+        self.segment_size = segment_size
+        self.codec = codec or default_codec()
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # The pipeline writes from a worker thread; callers use the archive
+        # from one thread at a time
+        self.index = sqlite3.connect(os.path.join(archive_dir, "index.sqlite"), check_same_thread=False)
+        self.index.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs (hash),
+                kind TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (url, hash)
+            );
+            CREATE INDEX IF NOT EXISTS pages_last_seen ON pages (url, last_seen);
+        """)
+
+    def close(self) -> None:
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _current_segment(self, size: int) -> int:
+        """Return the segment to append the next blob of the given size to."""
+        row = self.index.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        segment = row[0] or 1
+        path = segment_path(self.archive_dir, segment)
+        if os.path.exists(path) and os.path.getsize(path) > 0 and os.path.getsize(path) + size > self.segment_size:
+            segment += 1
+        return segment
+
+    def put(self, url: str, html: str, kind: str = ARTICLE, fetched_at: Optional[datetime] = None) -> str:
+        """Store a page source for a URL and return its content hash."""
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        seen = (fetched_at or datetime.now()).isoformat()
+
+        with self.index:
+            known = self.index.execute("SELECT 1 FROM blobs WHERE hash = ?", (content_hash,)).fetchone()
+            if not known:
+                compressed = compress(data, self.codec)
+                segment = self._current_segment(len(compressed))
+                with open(segment_path(self.archive_dir, segment), "ab") as f:
+                    offset = f.tell()
+                    f.write(compressed)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.index.execute(
+                    "INSERT INTO blobs (hash, segment, offset, length, codec, size) VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_hash, segment, offset, len(compressed), self.codec, len(data))
+                )
+
+            self.index.execute(
+                """
+                INSERT INTO pages (url, hash, kind, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url, hash) DO UPDATE SET last_seen = excluded.last_seen
+                """,
+                (url, content_hash, kind, seen, seen)
+            )
+
+        return content_hash
+
+    def locate(self, url: str) -> Optional[Location]:
+        """Return the location of the most recently seen version of a URL."""
+        row = self.index.execute(
+            """
+            SELECT b.segment, b.offset, b.length, b.codec
+            FROM pages p JOIN blobs b ON b.hash = p.hash
+            WHERE p.url = ?
+            ORDER BY p.last_seen DESC
+            LIMIT 1
+            """,
+            (url,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the most recently seen page source for a URL."""
+        location = self.locate(url)
+        if location is None:
+            return None
+        return read_location(self.archive_dir, location)
+
+    def get_by_hash(self, content_hash: str) -> Optional[str]:
+        row = self.index.execute(
+            "SELECT segment, offset, length, codec FROM blobs WHERE hash = ?", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        return read_location(self.archive_dir, tuple(row))
+
+    def versions(self, url: str) -> List[str]:
+        """Return the content hashes seen for a URL, oldest first."""
+        rows = self.index.execute(
+            "SELECT hash FROM pages WHERE url = ? ORDER BY last_seen", (url,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def latest(self, kind: Optional[str] = None) -> Iterator[Tuple[str, Location]]:
+        """Yield the URL and location of the latest version of every page."""
+        rows = self.index.execute(
+            """
+            SELECT p.url, b.segment, b.offset, b.length, b.codec
+            FROM pages p JOIN blobs b ON b.hash = p.hash
+            WHERE (? IS NULL OR p.kind = ?)
+            ORDER BY p.url, p.last_seen DESC
+            """,
+            (kind, kind)
+        )
+        previous_url = None
+        for url, segment, offset, length, codec in rows:
+            if url != previous_url:
+                yield url, (segment, offset, length, codec)
+                previous_url = url
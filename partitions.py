@@ -0,0 +1,80 @@
+import argparse
+from datetime import date, datetime
+from typing import Iterable
+from sqlalchemy import text
+
+# blog_articles is partitioned by season (1 July to 30 June), see the
+# migration a7c5e2f8d913. Articles outside all seasons go to this partition.
+DEFAULT_PARTITION = "blog_articles_default"
+# Advisory lock serializing the creation of partitions by concurrent loaders
+PARTITION_LOCK_QUERY = text("SELECT pg_advisory_xact_lock(hashtext('blog_articles_partitions'))")
+
+def season_of(day) -> int:
+    """Return the year the season of a date starts in."""
+    return day.year if day.month >= 7 else day.year - 1
+
+def season_start(year: int) -> datetime:
+    return datetime(year, 7, 1)
+
+def partition_name(year: int) -> str:
+    return f"blog_articles_{year}_{(year + 1) % 100:02d}"
+
+def ensure_season_partition(db, year: int) -> bool:
+    """Create the partition of a season if it does not exist yet.
+
+    Articles of the season that went to the default partition are moved
+    into the new partition. Returns whether a partition was created.
+    Concurrent callers wait for each other until the transaction ends, so
+    only one of them creates the partition.
+    """
+    name = partition_name(year)
+    db.execute(PARTITION_LOCK_QUERY)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+
+    start, end = season_start(year), season_start(year + 1)
+    db.execute(text(f"CREATE TABLE {name} (LIKE blog_articles INCLUDING DEFAULTS)"))
+    # The new table is no partition yet, so the row triggers of blog_articles
+    # would take the moved articles for deleted ones, and e.g. delete their
+    # chunks and free their URLs
+    db.execute(text(f"ALTER TABLE {DEFAULT_PARTITION} DISABLE TRIGGER USER"))
+    moved = db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end}).rowcount
+    db.execute(text(f"ALTER TABLE {DEFAULT_PARTITION} ENABLE TRIGGER USER"))
+    # Attaching creates the partition's indexes from those of blog_articles
+    db.execute(text(
+        f"ALTER TABLE blog_articles ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    print(f"Created partition {name} ({moved} articles moved from {DEFAULT_PARTITION})")
+    return True
+
+def ensure_season_partitions(db, days: Iterable = ()) -> None:
+    """Make sure the current and next season and the seasons of the given dates have partitions."""
+    current = season_of(date.today())
+    for year in sorted({current, current + 1} | {season_of(day) for day in days}):
+        ensure_season_partition(db, year)
+    db.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the blog_articles partitions of the current and next season.")
+    parser.add_argument("--season", type=int, action="append", default=[],
+                        help="Also create the partition of the season starting in this year")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from models.database import SessionLocal
+
+    load_dotenv()
+    db = SessionLocal()
+    try:
+        ensure_season_partitions(db, [date(year, 7, 1) for year in args.season])
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+import time
+import asyncio
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urljoin
+import aiohttp
+from dotenv import load_dotenv
+from embedding_model import get_embeddings, embedding_version, content_hash
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from article_parser import parse_article, parse_listing, parse_article_date
+from page_archive import PageArchive, LISTING, ARTICLE
+from replay_blog import build_record
+from load_embeddings import check_duplicate, redated_articles, redate_article
+from dedup import DuplicateIndex, DEDUP_MODE
+from chunking import chunk_text, count_tokens, aembed_texts
+from models.database import AsyncSessionLocal
+from partitions import ensure_season_partitions
+from models.blog_article import BlogArticle
+from models.article_chunk import ArticleChunk
+
+# Base URL for the VfB website
+BASE_URL = "https://www.vfb.de/de/1893/aktuell/neues/"
+
+# Default concurrency of each stage
+FETCH_CONCURRENCY = 4
+PARSE_WORKERS = os.cpu_count() or 1
+EMBED_CONCURRENCY = 4
+LOAD_BATCH_SIZE = 16
+
+# Maximum number of items waiting between two stages
+QUEUE_SIZE = 32
+
+# Timeout in seconds for a single page request
+REQUEST_TIMEOUT = 30
+
+# Marks the end of the input of a stage worker
+DONE = object()
+
+class HttpFetcher:
+    """Fetch pages over a pooled aiohttp session."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def fetch(self, url: str) -> str:
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+
+class BrowserFetcher:
+    """Fetch JavaScript-rendered pages with a pool of Selenium drivers.
+
+    Each driver is used by one request at a time; the blocking Selenium calls
+    run in threads so they do not stall the other stages.
+    """
+
+    def __init__(self, concurrency: int, wait_time: int = 3):
+        self.concurrency = concurrency
+        self.wait_time = wait_time
+        self.drivers = asyncio.Queue()
+
+    async def __aenter__(self):
+        from crawl_blog import setup_driver
+
+        for _ in range(self.concurrency):
+            self.drivers.put_nowait(await asyncio.to_thread(setup_driver))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        while not self.drivers.empty():
+            await asyncio.to_thread(self.drivers.get_nowait().quit)
+
+    def _load(self, driver, url: str) -> str:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        driver.get(url)
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.TAG_NAME, "body"))
+        )
+        # Give additional time for all content to load
+        time.sleep(self.wait_time)
+        return driver.page_source
+
+    async def fetch(self, url: str) -> str:
+        driver = await self.drivers.get()
+        try:
+            return await asyncio.to_thread(self._load, driver, url)
+        finally:
+            self.drivers.put_nowait(driver)
+
+async def run_stage(name: str, handler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue],
+                    concurrency: int, next_concurrency: int = 0, stats: Optional[dict] = None) -> None:
+    """Run a stage with the given number of workers between two queues.
+
+    Each worker stops when it takes DONE from its inbox. Once all workers have
+    stopped, one DONE per worker of the next stage is put into the outbox.
+    Putting into a full outbox blocks, which slows this stage down to the
+    pace of the next one. Items the handler fails on are counted in
+    stats["failed"].
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is DONE:
+                return
+            try:
+                result = await handler(item)
+            except Exception as e:
+                print(f"[{name}] Error processing {item.get('url', '')}: {str(e)}")
+                if stats is not None:
+                    stats["failed"] += 1
+                continue
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    for _ in range(next_concurrency):
+        await outbox.put(DONE)
+
+async def run_pipeline(fetch_concurrency: int = FETCH_CONCURRENCY, parse_workers: int = PARSE_WORKERS,
+                       embed_concurrency: int = EMBED_CONCURRENCY, load_batch_size: int = LOAD_BATCH_SIZE,
+                       queue_size: int = QUEUE_SIZE, use_browser: bool = False,
+                       max_articles: Optional[int] = None, dedup_mode: str = DEDUP_MODE) -> None:
+    """Crawl, parse, embed and load new articles with all stages running concurrently."""
+    load_dotenv()
+
+    embeddings = get_embeddings()
+    version = embedding_version()
+    loop = asyncio.get_running_loop()
+    fetch_queue = asyncio.Queue(queue_size)
+    parse_queue = asyncio.Queue(queue_size)
+    embed_queue = asyncio.Queue(queue_size)
+    load_queue = asyncio.Queue(queue_size)
+    stats = {"loaded": 0, "failed": 0, "latencies": []}
+    started = time.monotonic()
+
+    fetcher_class = BrowserFetcher if use_browser else HttpFetcher
+    duplicates = DuplicateIndex() if dedup_mode != "off" else None
+    # Archive writes (SQLite and fsync) run on their own thread, one at a
+    # time, so that they do not block the event loop
+    with PageArchive() as archive, ProcessPoolExecutor(max_workers=parse_workers) as executor, \
+            ThreadPoolExecutor(max_workers=1) as archive_executor:
+        async with fetcher_class(fetch_concurrency) as fetcher:
+
+            async def discover():
+                """Queue the articles on the listing page that are not in the database yet."""
+                try:
+                    listing_html = await fetcher.fetch(BASE_URL)
+                    await loop.run_in_executor(archive_executor, partial(archive.put, BASE_URL, listing_html, kind=LISTING))
+
+                    async with AsyncSessionLocal() as db:
+                        known_dates = dict((await db.execute(select(BlogArticle.url, BlogArticle.date))).tuples())
+
+                        teasers = []
+                        for teaser in parse_listing(listing_html):
+                            if not teaser["url"]:
+                                continue
+                            teaser["url"] = urljoin(BASE_URL, teaser["url"])
+                            if teaser["image_url"]:
+                                teaser["image_url"] = urljoin(BASE_URL, teaser["image_url"])
+                            teasers.append(teaser)
+
+                        # New articles are from the current season, older ones go to the default partition
+                        moves = redated_articles(known_dates, teasers)
+                        await db.run_sync(ensure_season_partitions, [day for _, _, day in moves])
+                        # Known articles whose date changed are moved without fetching them again
+                        for move in moves:
+                            await db.execute(redate_article(*move))
+                        await db.commit()
+                        if moves:
+                            print(f"[discover] Moved {len(moves)} articles to their new dates")
+
+                    teasers = [teaser for teaser in teasers if teaser["url"] not in known_dates][:max_articles]
+                    print(f"[discover] Found {len(teasers)} new articles")
+
+                    for teaser in teasers:
+                        await fetch_queue.put({"url": teaser["url"], "listing": teaser, "started": time.monotonic()})
+                except Exception as e:
+                    print(f"[discover] Error reading the listing page: {str(e)}")
+                finally:
+                    # Always shut the stages down, even if discovery failed
+                    for _ in range(fetch_concurrency):
+                        await fetch_queue.put(DONE)
+
+            async def fetch(item):
+                item["html"] = await fetcher.fetch(item["url"])
+                await loop.run_in_executor(archive_executor, partial(archive.put, item["url"], item["html"], kind=ARTICLE))
+                return item
+
+            async def parse(item):
+                # Parsing is CPU-bound, so it runs in the process pool
+                parsed = await loop.run_in_executor(executor, parse_article, item.pop("html"))
+                if not parsed["content_found"]:
+                    print(f"[parse] Could not find content div in {item['url']}")
+                    stats["failed"] += 1
+                    return None
+                item["record"] = build_record(parsed, item["listing"], item["url"])
+
+                # Near-duplicates are flagged or dropped before they reach the embed stage
+                item["cluster_id"], item["needs_embeddings"] = check_duplicate(duplicates, item["record"], dedup_mode)
+                if not item["needs_embeddings"] and dedup_mode == "skip":
+                    duplicates.discard([item["record"]["url"]])
+                    return None
+                return item
+
+            async def embed(item):
+                if not item["needs_embeddings"]:
+                    item["content_embedding"] = item["summary_embedding"] = None
+                    item["chunks"] = []
+                    return item
+                record = item["record"]
+                chunks = chunk_text(record["content"])
+
+                # Article, summary and chunks are embedded in as few requests as possible
+                vectors = await aembed_texts(
+                    embeddings,
+                    [record["content"], record["summary"]] + [text for text, _ in chunks],
+                    [count_tokens(record["content"]), count_tokens(record["summary"])] + [tokens for _, tokens in chunks]
+                )
+                item["content_embedding"], item["summary_embedding"] = vectors[:2]
+                item["chunks"] = [
+                    (text, tokens, vector) for (text, tokens), vector in zip(chunks, vectors[2:])
+                ]
+                return item
+
+            async def load():
+                """Insert embedded articles in batches of whatever is ready."""
+                while True:
+                    batch = [await load_queue.get()]
+                    while batch[-1] is not DONE and len(batch) < load_batch_size and not load_queue.empty():
+                        batch.append(load_queue.get_nowait())
+                    finished = batch[-1] is DONE
+                    items = [item for item in batch if item is not DONE]
+
+                    # An article that cannot be turned into a row is skipped, not the batch
+                    rows = []
+                    valid_items = []
+                    for item in items:
+                        try:
+                            rows.append({
+                                "title": item["record"]["title"],
+                                "url": item["record"]["url"],
+                                "date": parse_article_date(item["record"]["date"]),
+                                "content": item["record"]["content"],
+                                "summary": item["record"]["summary"],
+                                "content_embedding": item["content_embedding"],
+                                "summary_embedding": item["summary_embedding"],
+                                "cluster_id": item["cluster_id"],
+                                "embedding_version": version if item["needs_embeddings"] else None,
+                                "content_hash": content_hash(item["record"]["content"], item["record"]["summary"]),
+                            })
+                        except Exception as e:
+                            print(f"[load] Error processing {item['url']}: {str(e)}")
+                            stats["failed"] += 1
+                            if duplicates is not None:
+                                duplicates.discard([item["record"]["url"]])
+                            continue
+                        valid_items.append(item)
+                    items = valid_items
+
+                    if items:
+                        try:
+                            async with AsyncSessionLocal() as db:
+                                inserted = await db.execute(
+                                    insert(BlogArticle).values(rows)
+                                    .on_conflict_do_nothing(index_elements=["url", "date"])
+                                    .returning(BlogArticle.id, BlogArticle.url)
+                                )
+                                article_ids = {row.url: row.id for row in inserted}
+
+                                # Chunks of articles that were already loaded are skipped with them
+                                chunk_rows = [{
+                                    "article_id": article_ids[item["record"]["url"]],
+                                    "chunk_index": chunk_index,
+                                    "content": text,
+                                    "token_count": tokens,
+                                    "embedding": vector,
+                                    "embedding_version": version,
+                                } for item in items if item["record"]["url"] in article_ids
+                                  for chunk_index, (text, tokens, vector) in enumerate(item["chunks"])]
+                                if chunk_rows:
+                                    await db.execute(insert(ArticleChunk).values(chunk_rows))
+                                await db.commit()
+                        except Exception as e:
+                            print(f"[load] Error loading {len(rows)} articles: {str(e)}")
+                            stats["failed"] += len(rows)
+                            if duplicates is not None:
+                                duplicates.discard(item["record"]["url"] for item in items)
+                        else:
+                            # Only loaded articles are kept in the near-duplicate index
+                            if duplicates is not None:
+                                duplicates.save(item["record"]["url"] for item in items)
+                            now = time.monotonic()
+                            for item in items:
+                                stats["latencies"].append(now - item["started"])
+                                print(f"[load] Loaded {item['record']['title']} in {now - item['started']:.1f}s")
+                            stats["loaded"] += len(items)
+
+                    if finished:
+                        return
+
+            await asyncio.gather(
+                discover(),
+                run_stage("fetch", fetch, fetch_queue, parse_queue, fetch_concurrency, parse_workers, stats),
+                run_stage("parse", parse, parse_queue, embed_queue, parse_workers, embed_concurrency, stats),
+                run_stage("embed", embed, embed_queue, load_queue, embed_concurrency, 1, stats),
+                load(),
+            )
+
+    if duplicates is not None:
+        duplicates.close()
+
+    elapsed = time.monotonic() - started
+    latencies = stats["latencies"]
+    average = sum(latencies) / len(latencies) if latencies else 0
+    print(f"Loaded {stats['loaded']} articles in {elapsed:.1f}s (average latency per article {average:.1f}s)")
+    if stats["failed"]:
+        print(f"Failed to load {stats['failed']} articles")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl, embed and load new blog articles in one pipelined run.")
+    parser.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY, help="Pages fetched at the same time")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Processes parsing pages (default: number of cores)")
+    parser.add_argument("--embed-concurrency", type=int, default=EMBED_CONCURRENCY, help="Embedding requests in flight at the same time")
+    parser.add_argument("--load-batch-size", type=int, default=LOAD_BATCH_SIZE, help="Maximum number of articles per insert")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Maximum number of items waiting between two stages")
+    parser.add_argument("--browser", action="store_true", help="Fetch pages with Selenium instead of plain HTTP requests")
+    parser.add_argument("--max-articles", type=int, help="Only process the first new articles of the listing page")
+    parser.add_argument("--dedup-mode", choices=["flag", "skip", "off"], default=DEDUP_MODE,
+                        help="Store near-duplicates without embeddings (flag), drop them (skip) or embed everything (off)")
+    args = parser.parse_args(argv)
+
+    asyncio.run(run_pipeline(
+        fetch_concurrency=args.fetch_concurrency,
+        parse_workers=args.parse_workers,
+        embed_concurrency=args.embed_concurrency,
+        load_batch_size=args.load_batch_size,
+        queue_size=args.queue_size,
+        use_browser=args.browser,
+        max_articles=args.max_articles,
+        dedup_mode=args.dedup_mode,
+    ))
+
+if __name__ == "__main__":
+    main()
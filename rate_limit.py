@@ -0,0 +1,310 @@
+import os
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+from typing import Mapping, Optional
+
+# Request priorities, lower values are served first
+INTERACTIVE = 0
+BULK = 1
+
+# Provider quota per minute, used until the first response reports the real limits
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+
+# Share of the quota that bulk requests leave free for interactive ones while
+# searches are running, i.e. for INTERACTIVE_WINDOW seconds after the last one.
+# Without searches, bulk requests use the whole quota.
+INTERACTIVE_RESERVE = float(os.getenv("EMBEDDING_INTERACTIVE_RESERVE", "0.1"))
+INTERACTIVE_WINDOW = 60
+
+# Name of the row of embedding_quota holding the quota shared by all
+# processes, see SharedQuota. EMBEDDING_SHARED_QUOTA=0 keeps the quota per process.
+SHARED_QUOTA_NAME = "embeddings"
+
+# Retries of a failed request and the bounds of the jittered backoff in seconds
+MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "8"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRY_STATUS_CODES = {408, 409, 429}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a reset duration like "6m0s", "1.5s" or "20ms" into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNITS[unit] for amount, unit in parts)
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Return the seconds to wait given by a rate-limited response, if any."""
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            return None
+    resets = [
+        parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        for kind in ("requests", "tokens")
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+def backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter, so that clients do not retry in lockstep."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def is_retryable(status_code: int) -> bool:
+    return status_code in RETRY_STATUS_CODES or status_code >= 500
+
+class TokenBucket:
+    """Bucket refilled continuously up to a per-minute limit.
+
+    The level may go negative when more is taken than available (e.g. when
+    the provider reports fewer remaining tokens than estimated), which delays
+    the following requests accordingly.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, reserve: float = 0) -> float:
+        """Seconds until amount can be taken while leaving the reserved share of the capacity."""
+        self.refill(now)
+        target = min(self.capacity, amount + reserve * self.capacity)
+        return max(0.0, (target - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def set_limit(self, per_minute: float) -> None:
+        if per_minute > 0 and per_minute != self.capacity:
+            self.capacity = per_minute
+            self.rate = per_minute / 60
+            self.level = min(self.level, per_minute)
+
+    def observe_remaining(self, remaining: float, now: float) -> None:
+        """Lower the level to what the provider reports as remaining."""
+        self.refill(now)
+        self.level = min(self.level, remaining)
+
+class SharedQuota:
+    """Requests and tokens per minute shared by all processes using the same database.
+
+    Searches and bulk jobs run in separate processes, each with its own
+    scheduler. They take their requests from the same two buckets, kept in a
+    row of embedding_quota and updated under a row lock. The row also records
+    the last interactive request, so bulk jobs leave the interactive reserve
+    free while searches run in any process.
+    """
+
+    SELECT_QUERY = """
+        SELECT requests, tokens,
+               EXTRACT(EPOCH FROM clock_timestamp() - updated_at),
+               EXTRACT(EPOCH FROM clock_timestamp() - last_interactive)
+        FROM embedding_quota
+        WHERE name = %s
+        FOR UPDATE
+    """
+    INSERT_QUERY = """
+        INSERT INTO embedding_quota (name, requests, tokens, updated_at)
+        VALUES (%s, %s, %s, clock_timestamp())
+        ON CONFLICT (name) DO NOTHING
+    """
+    UPDATE_QUERY = """
+        UPDATE embedding_quota
+        SET requests = %s, tokens = %s, updated_at = clock_timestamp(),
+            last_interactive = CASE WHEN %s THEN clock_timestamp() ELSE last_interactive END
+        WHERE name = %s
+    """
+
+    def __init__(self, url: str, name: str = SHARED_QUOTA_NAME):
+        self.url = url
+        self.name = name
+        self.connection = None
+
+    def _cursor(self):
+        import psycopg2
+
+        if self.connection is None or self.connection.closed:
+            self.connection = psycopg2.connect(self.url)
+        return self.connection.cursor()
+
+    def take(self, tokens: int, priority: int, rpm: float, tpm: float, reserve: float) -> float:
+        """Take a request with the given tokens, or return the seconds to wait before trying again."""
+        with self._cursor() as cur:
+            cur.execute(self.SELECT_QUERY, (self.name,))
+            row = cur.fetchone()
+            if row is None:
+                cur.execute(self.INSERT_QUERY, (self.name, rpm, tpm))
+                cur.execute(self.SELECT_QUERY, (self.name,))
+                row = cur.fetchone()
+            requests_level, tokens_level, elapsed, since_interactive = row
+
+            requests, token_bucket = TokenBucket(rpm), TokenBucket(tpm)
+            for bucket, level in ((requests, requests_level), (token_bucket, tokens_level)):
+                bucket.level = min(bucket.capacity, level)
+                bucket.updated = 0.0
+            interactive = priority == INTERACTIVE
+            if interactive or since_interactive is None or since_interactive >= INTERACTIVE_WINDOW:
+                reserve = 0
+            now = max(0.0, float(elapsed))
+            wait = max(requests.wait_time(1, now, reserve), token_bucket.wait_time(tokens, now, reserve))
+            if wait <= 0:
+                requests.take(1)
+                token_bucket.take(tokens)
+            cur.execute(self.UPDATE_QUERY, (requests.level, token_bucket.level, interactive, self.name))
+        self.connection.commit()
+        return wait
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class RateLimitScheduler:
+    """Pace requests to stay within a requests-per-minute and a tokens-per-minute quota.
+
+    Callers block in acquire() until both buckets allow their request. Waiting
+    callers are served by priority, then in arrival order, so interactive
+    requests overtake queued bulk requests. While searches are being made,
+    bulk requests also leave a share of the quota unused. The buckets follow the limits and remaining quota
+    reported in the x-ratelimit-* response headers, which also accounts for
+    requests sent by other processes with the same API key. With a
+    SharedQuota, requests are also taken from the buckets of all processes.
+    """
+
+    def __init__(self, rpm: float = EMBEDDING_RPM, tpm: float = EMBEDDING_TPM,
+                 interactive_reserve: float = INTERACTIVE_RESERVE, shared: Optional[SharedQuota] = None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.interactive_reserve = interactive_reserve
+        self.shared = shared
+        self.blocked_until = 0.0
+        self.last_interactive = float("-inf")
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+
+    def acquire(self, tokens: int, priority: int = BULK) -> None:
+        """Block until a request with the given number of tokens may be sent."""
+        ticket = (priority, next(self.counter))
+        with self.condition:
+            if priority == INTERACTIVE:
+                self.last_interactive = time.monotonic()
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self.waiting[0] == ticket:
+                        now = time.monotonic()
+                        reserve = 0
+                        if priority != INTERACTIVE and now - self.last_interactive < INTERACTIVE_WINDOW:
+                            reserve = self.interactive_reserve
+                        timeout = max(
+                            self.blocked_until - now,
+                            self.requests.wait_time(1, now, reserve),
+                            self.tokens.wait_time(tokens, now, reserve),
+                        )
+                        if timeout <= 0:
+                            timeout = self._take_shared(tokens, priority)
+                        if timeout <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                    self.condition.wait(timeout)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+    def _take_shared(self, tokens: int, priority: int) -> float:
+        """Take a request from the shared quota, returning the seconds to wait if it is used up."""
+        if self.shared is None:
+            return 0.0
+        try:
+            return self.shared.take(tokens, priority, self.requests.capacity, self.tokens.capacity,
+                                    self.interactive_reserve)
+        except Exception as e:
+            # Without the shared quota, the limits still hold for this process
+            print(f"Shared embedding quota unavailable, limiting this process only: {str(e)}")
+            self.shared.close()
+            self.shared = None
+            return 0.0
+
+    def update(self, headers: Mapping[str, str], estimated_tokens: int = 0,
+               used_tokens: Optional[int] = None) -> None:
+        """Adapt to the rate limit headers of a successful response.
+
+        If the response reports the tokens actually used, the difference to
+        the estimate taken in acquire() is given back or charged, unless the
+        remaining tokens reported by the provider already account for it.
+        """
+        with self.condition:
+            now = time.monotonic()
+            observed = set()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                if limit:
+                    bucket.set_limit(float(limit))
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining:
+                    bucket.observe_remaining(float(remaining), now)
+                    observed.add(kind)
+            if used_tokens is not None and "tokens" not in observed:
+                self.tokens.level += estimated_tokens - used_tokens
+            self.condition.notify_all()
+
+    def rate_limited(self, headers: Mapping[str, str]) -> None:
+        """Stop all requests until the provider's rate limit resets."""
+        with self.condition:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + (retry_after(headers) or BACKOFF_BASE))
+            self.requests.observe_remaining(0, now)
+            self.condition.notify_all()
+
+# Scheduler shared by all embedding clients of the process
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> RateLimitScheduler:
+    """Return the process-wide scheduler, creating it on first use.
+
+    The quota is shared with the other processes through the database unless
+    EMBEDDING_SHARED_QUOTA=0.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            shared = None
+            if os.getenv("EMBEDDING_SHARED_QUOTA", "1") != "0":
+                from models.database import database_url
+                from sqlalchemy.engine import make_url
+
+                url = make_url(database_url()).set(drivername="postgresql").render_as_string(hide_password=False)
+                shared = SharedQuota(url)
+            _scheduler = RateLimitScheduler(shared=shared)
+        return _scheduler
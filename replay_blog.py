@@ -0,0 +1,160 @@
+import os
+import glob
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+from article_parser import parse_article, parse_listing, article_text, article_filename
+from page_archive import PageArchive, Location, read_location, ARCHIVE_DIR, LISTING, ARTICLE
+
+# Directory the blog crawler writes its JSON files to
+OUTPUT_DIR = "blog_articles"
+
+# Base URL for the VfB website, used to resolve relative image URLs
+BASE_URL = "https://www.vfb.de/de/1893/aktuell/neues/"
+
+def load_listing_records(record_files: List[str], key: str = "url") -> Dict[str, Dict[str, Any]]:
+    """Load previously crawled records, keyed by URL or by article filename.
+
+    The listing page provides fields that the article page does not (summary,
+    teaser title, URL). Later files win, so the most recent crawl is used.
+    """
+    records = {}
+    for record_file in record_files:
+        with open(record_file, "r", encoding="utf-8") as f:
+            for record in json.load(f):
+                if key == "filename":
+                    records[article_filename(record["title"])] = record
+                else:
+                    records[record["url"]] = record
+    return records
+
+def load_archived_listings(archive: PageArchive) -> Dict[str, Dict[str, Any]]:
+    """Parse every archived version of the listing pages, keyed by article URL.
+
+    Versions are processed oldest first, so newer teasers win.
+    """
+    records = {}
+    for listing_url, _ in archive.latest(kind=LISTING):
+        for content_hash in archive.versions(listing_url):
+            for teaser in parse_listing(archive.get_by_hash(content_hash)):
+                if not teaser["url"]:
+                    continue
+                teaser["url"] = urljoin(listing_url, teaser["url"])
+                if teaser["image_url"]:
+                    teaser["image_url"] = urljoin(listing_url, teaser["image_url"])
+                records[teaser["url"]] = teaser
+    return records
+
+def parse_archived_page(task: Tuple[str, str, Location]) -> Tuple[str, Dict[str, Any]]:
+    """Parse one archived article page. Runs in a worker process."""
+    archive_dir, url, location = task
+    return url, parse_article(read_location(archive_dir, location))
+
+def parse_html_file(path: str) -> Tuple[str, Dict[str, Any]]:
+    """Parse one saved article page. Runs in a worker process."""
+    with open(path, "r", encoding="utf-8") as f:
+        return path, parse_article(f.read())
+
+def build_record(parsed: Dict[str, Any], listing: Optional[Dict[str, Any]], url: str = "") -> Dict[str, Any]:
+    """Build a record in the format written by crawl_blog.py."""
+    if listing:
+        record = {
+            "title": listing["title"],
+            "url": listing["url"],
+            "date": listing["date"],
+            "summary": listing["summary"],
+            "image_url": listing["image_url"],
+            "categories": listing["categories"],
+        }
+    else:
+        # Without a listing record, fall back to what the article page offers
+        url = url or parsed["canonical_url"]
+        image_url = ""
+        if parsed["image_url"]:
+            image_url = urljoin(url or BASE_URL, parsed["image_url"])
+        record = {
+            "title": parsed["content_title"] or parsed["title"],
+            "url": url,
+            "date": parsed["date"],
+            "summary": parsed["description"],
+            "image_url": image_url,
+            "categories": parsed["categories"],
+        }
+
+    record["full_title"] = parsed["content_title"]
+    record["content"] = article_text(parsed)
+    return record
+
+def parse_in_parallel(worker, tasks: List[Any], workers: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Run the parse worker over all tasks in a process pool."""
+    # Hand out several pages per task to keep the inter-process overhead low
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(worker, tasks, chunksize=chunksize)
+
+def replay_articles(archive_dir: str = ARCHIVE_DIR, html_dir: Optional[str] = None,
+                    record_files: Optional[List[str]] = None, output_file: Optional[str] = None,
+                    workers: Optional[int] = None) -> str:
+    """Re-parse all archived article pages in parallel and write a new JSON file.
+
+    With html_dir, the individual HTML files written by older crawler versions
+    are parsed instead of the page archive.
+    """
+    if record_files is None:
+        record_files = sorted(
+            path for path in glob.glob(os.path.join(OUTPUT_DIR, "vfb_articles_*.json"))
+            if "_replay_" not in os.path.basename(path)
+        )
+    workers = workers or os.cpu_count() or 1
+
+    articles = []
+    if html_dir is None:
+        with PageArchive(archive_dir) as archive:
+            listing_records = load_archived_listings(archive)
+            listing_records.update(load_listing_records(record_files))
+            tasks = [(archive_dir, url, location) for url, location in archive.latest(kind=ARTICLE)]
+        print(f"Found {len(tasks)} archived article pages and {len(listing_records)} listing records")
+
+        for url, parsed in parse_in_parallel(parse_archived_page, tasks, workers):
+            if not parsed["content_found"]:
+                print(f"Could not find content div in {url}")
+                continue
+            articles.append(build_record(parsed, listing_records.get(url), url))
+    else:
+        listing_records = load_listing_records(record_files, key="filename")
+        paths = sorted(glob.glob(os.path.join(html_dir, "*.html")))
+        print(f"Found {len(paths)} saved article pages in {html_dir} and {len(listing_records)} listing records")
+
+        for path, parsed in parse_in_parallel(parse_html_file, paths, workers):
+            if not parsed["content_found"]:
+                print(f"Could not find content div in {path}")
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            articles.append(build_record(parsed, listing_records.get(name)))
+
+    if output_file is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(OUTPUT_DIR, f"vfb_articles_replay_{timestamp}.json")
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(articles, f, ensure_ascii=False, indent=2)
+
+    print(f"Saved {len(articles)} articles to {output_file} using {workers} processes")
+    return output_file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-parse saved article HTML without crawling vfb.de again.")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Directory of the raw page archive")
+    parser.add_argument("--html-dir", help="Parse the individual HTML files in this directory instead of the archive")
+    parser.add_argument("--records", nargs="*", help=f"Crawler JSON files providing the listing fields (default: all in {OUTPUT_DIR})")
+    parser.add_argument("--output", help=f"Output JSON file (default: a new timestamped file in {OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of cores)")
+    args = parser.parse_args(argv)
+
+    replay_articles(args.archive_dir, args.html_dir, args.records, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import select
+import argparse
+import threading
+import numpy as np
+import psycopg2
+from sqlalchemy.engine import make_url
+from models.database import database_url, to_pgvector
+
+# Defaults of the cache settings, which can be overridden with the
+# environment variables of the same name (read when a cache is created, so
+# that .env files loaded by the scripts apply).
+# Minimum cosine similarity between two query embeddings to reuse the results.
+# Paraphrases of a question typically score 0.85 to 0.95 with the
+# text-embedding-3 models; check the threshold for your model with
+# `python search_cache.py --calibrate`.
+SEARCH_CACHE_THRESHOLD = 0.9
+# Number of queries kept, the least recently used one is replaced first
+SEARCH_CACHE_SIZE = 1000
+# Seconds after which a cached query is searched again, as a safety net
+SEARCH_CACHE_TTL = 3600
+
+# Whether results are also shared with other processes through the
+# search_cache table (default: 1)
+SEARCH_CACHE_SHARED = "1"
+
+# Channel notified by the triggers on blog_articles and article_chunks
+CHANGES_CHANNEL = "blog_articles_changed"
+
+# Pairs of searches that should and should not share results, for calibrating
+# the threshold
+PARAPHRASES = [
+    ("Wer hat gestern getroffen?", "Torschützen gestern"),
+    ("Wie hat der VfB gespielt?", "Ergebnis vom VfB-Spiel"),
+    ("Wann ist das nächste Heimspiel?", "Termin nächstes Heimspiel"),
+    ("Ist Undav verletzt?", "Verletzung von Deniz Undav"),
+]
+DIFFERENT_QUESTIONS = [
+    ("Wer hat gestern getroffen?", "Wer hat heute getroffen?"),
+    ("Ist Undav verletzt?", "Ist Mittelstädt verletzt?"),
+    ("Wie hat der VfB gespielt?", "Wie haben die VfB-Frauen gespielt?"),
+    ("Wann ist das nächste Heimspiel?", "Wann ist das nächste Auswärtsspiel?"),
+]
+
+def _dsn(url=None):
+    return make_url(url or database_url()).set(drivername="postgresql").render_as_string(hide_password=False)
+
+class CachedResult(dict):
+    """A result read back from the shared cache, with the fields also readable as attributes like a row."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+def _serialize(results):
+    return json.dumps([
+        result._asdict() if hasattr(result, "_asdict") else result for result in results
+    ], default=str)
+
+class ArticleChangeListener:
+    """Listen for changes of the searched tables on a dedicated connection.
+
+    changed() only reads notifications the server has already sent, so it
+    does not cost a round trip. If the connection is lost, notifications may
+    have been missed, so this is reported as a change too.
+    """
+
+    def __init__(self, url=None):
+        self.dsn = _dsn(url)
+        self.connection = None
+
+    def _connect(self):
+        self.connection = psycopg2.connect(self.dsn)
+        self.connection.autocommit = True
+        with self.connection.cursor() as cur:
+            cur.execute(f"LISTEN {CHANGES_CHANNEL}")
+
+    def changed(self) -> bool:
+        """Return whether articles changed since the last call."""
+        try:
+            if self.connection is None or self.connection.closed:
+                self._connect()
+                return True
+            if select.select([self.connection], [], [], 0)[0]:
+                self.connection.poll()
+            if self.connection.notifies:
+                self.connection.notifies.clear()
+                return True
+            return False
+        except psycopg2.Error as e:
+            print(f"Search cache lost its change listener: {str(e)}")
+            self.close()
+            return True
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class SharedResultCache:
+    """Search results shared by all processes in the search_cache table.
+
+    The table is emptied by triggers whenever articles or chunks change. It
+    only holds the searches of the last TTL, so it is searched exactly,
+    without a vector index.
+    """
+
+    LOOKUP_QUERY = """
+        SELECT results, 1 - (embedding <=> %(embedding)s::vector) AS similarity
+        FROM search_cache
+        WHERE mode = %(mode)s AND result_limit >= %(limit)s
+          AND created_at > clock_timestamp() - make_interval(secs => %(ttl)s)
+        ORDER BY embedding <=> %(embedding)s::vector
+        LIMIT 1
+    """
+    STORE_QUERY = """
+        INSERT INTO search_cache (mode, result_limit, embedding, results)
+        VALUES (%(mode)s, %(limit)s, %(embedding)s::vector, %(results)s::jsonb)
+    """
+    EXPIRE_QUERY = "DELETE FROM search_cache WHERE created_at < clock_timestamp() - make_interval(secs => %(ttl)s)"
+
+    def __init__(self, url=None):
+        self.dsn = _dsn(url)
+        self.connection = None
+
+    def _cursor(self):
+        if self.connection is None or self.connection.closed:
+            self.connection = psycopg2.connect(self.dsn)
+            self.connection.autocommit = True
+        return self.connection.cursor()
+
+    def lookup(self, embedding, limit, mode, threshold, ttl):
+        """Return the results of the most similar shared search at or above the threshold, or None."""
+        with self._cursor() as cur:
+            cur.execute(self.LOOKUP_QUERY, {"embedding": to_pgvector(embedding), "mode": mode, "limit": limit, "ttl": ttl})
+            row = cur.fetchone()
+        if row is None or row[1] < threshold:
+            return None
+        return [CachedResult(result) for result in row[0]]
+
+    def store(self, embedding, limit, results, mode, ttl):
+        with self._cursor() as cur:
+            cur.execute(self.EXPIRE_QUERY, {"ttl": ttl})
+            cur.execute(self.STORE_QUERY, {
+                "embedding": to_pgvector(embedding), "mode": mode, "limit": limit, "results": _serialize(results)
+            })
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class SemanticCache:
+    """Cache search results by query embedding.
+
+    A query whose embedding has at least the threshold cosine similarity to a
+    cached query gets that query's results. Results cached for a larger limit
+    also serve smaller limits. The whole cache is dropped when the listener
+    reports changed articles, before every lookup. Queries missing in this
+    process's cache are looked up in the shared cache, if there is one.
+    Lookups and stores may come from several threads.
+    """
+
+    def __init__(self, threshold=None, size=None, ttl=None, listener=None, shared=None):
+        if threshold is None:
+            threshold = float(os.getenv("SEARCH_CACHE_THRESHOLD", SEARCH_CACHE_THRESHOLD))
+        if size is None:
+            size = int(os.getenv("SEARCH_CACHE_SIZE", SEARCH_CACHE_SIZE))
+        if ttl is None:
+            ttl = float(os.getenv("SEARCH_CACHE_TTL", SEARCH_CACHE_TTL))
+        self.threshold = threshold
+        self.size = size
+        self.ttl = ttl
+        self.listener = listener if listener is not None else ArticleChangeListener()
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.vectors = None
+        self.entries = []
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, embedding, limit, mode="articles"):
+        """Return cached results for a similar query, or None."""
+        with self.lock:
+            results = self._lookup_local(embedding, limit, mode)
+            if results is None and self.shared is not None:
+                results = self._lookup_shared(embedding, limit, mode)
+            if results is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return results
+
+    def _lookup_local(self, embedding, limit, mode):
+        if self.listener.changed():
+            self.clear()
+        if self.entries:
+            now = time.monotonic()
+            similarities = self.vectors[:len(self.entries)] @ self._normalize(embedding)
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                entry = self.entries[index]
+                if entry["mode"] == mode and entry["limit"] >= limit and now - entry["stored"] < self.ttl:
+                    entry["used"] = now
+                    return entry["results"][:limit]
+        return None
+
+    def _lookup_shared(self, embedding, limit, mode):
+        try:
+            results = self.shared.lookup(embedding, limit, mode, self.threshold, self.ttl)
+        except psycopg2.Error as e:
+            print(f"Shared search cache unavailable, caching in this process only: {str(e)}")
+            self.shared.close()
+            self.shared = None
+            return None
+        if results is not None:
+            self._store_local(embedding, limit, results, mode)
+            results = results[:limit]
+        return results
+
+    def store(self, embedding, limit, results, mode="articles"):
+        """Cache the results of a query, replacing the least recently used entry when full."""
+        with self.lock:
+            self._store_local(embedding, limit, results, mode)
+            if self.shared is not None:
+                try:
+                    self.shared.store(embedding, limit, results, mode, self.ttl)
+                except psycopg2.Error as e:
+                    print(f"Shared search cache unavailable, caching in this process only: {str(e)}")
+                    self.shared.close()
+                    self.shared = None
+
+    def _store_local(self, embedding, limit, results, mode):
+        vector = self._normalize(embedding)
+        if self.vectors is None:
+            self.vectors = np.empty((self.size, len(vector)), dtype=np.float32)
+        now = time.monotonic()
+        entry = {"mode": mode, "limit": limit, "results": list(results), "stored": now, "used": now}
+        if len(self.entries) < self.size:
+            index = len(self.entries)
+            self.entries.append(entry)
+        else:
+            index = min(range(len(self.entries)), key=lambda i: self.entries[i]["used"])
+            self.entries[index] = entry
+        self.vectors[index] = vector
+
+    def close(self):
+        self.listener.close()
+        if self.shared is not None:
+            self.shared.close()
+
+def create_search_cache():
+    """Create a cache listening for article changes and sharing results unless SEARCH_CACHE_SHARED=0."""
+    shared = SharedResultCache() if os.getenv("SEARCH_CACHE_SHARED", SEARCH_CACHE_SHARED) != "0" else None
+    return SemanticCache(shared=shared)
+
+def calibrate(embeddings):
+    """Print the similarities of paraphrases and of different questions, and a threshold between them."""
+    def similarities(pairs):
+        vectors = embeddings.embed_documents([text for pair in pairs for text in pair])
+        result = []
+        for (first, second), i in zip(pairs, range(0, len(vectors), 2)):
+            a, b = np.asarray(vectors[i]), np.asarray(vectors[i + 1])
+            similarity = float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+            print(f"{similarity:.3f}  {first} / {second}")
+            result.append(similarity)
+        return result
+
+    print("Paraphrases (should share results):")
+    lowest = min(similarities(PARAPHRASES))
+    print("Different questions (should not):")
+    highest = max(similarities(DIFFERENT_QUESTIONS))
+    if lowest > highest:
+        print(f"Suggested SEARCH_CACHE_THRESHOLD: {(lowest + highest) / 2:.3f}")
+    else:
+        print(f"No threshold separates them; above {highest:.3f} no different questions share results")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the similarity threshold of the search cache.")
+    parser.add_argument("--calibrate", action="store_true", help="Embed sample searches and suggest a threshold")
+    args = parser.parse_args(argv)
+
+    if args.calibrate:
+        from dotenv import load_dotenv
+        from embedding_model import get_embeddings
+
+        load_dotenv()
+        calibrate(get_embeddings())
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import contextlib
+from datetime import datetime
+import pytest
+import answer
+from answer import StubLLM, pack_context, answer_question, SYSTEM_PROMPT
+from chunking import count_tokens
+
+QUESTION = "Wer hat gegen Bremen getroffen?"
+
+PARAGRAPHS = [
+    "Der VfB Stuttgart hat gegen Werder Bremen mit 2:1 gewonnen. Deniz Undav traf zweimal.",
+    "Trainer Sebastian Hoeneß lobte nach dem Spiel die Moral seiner Mannschaft.",
+    "Das nächste Heimspiel findet am Samstag in der MHPArena statt.",
+]
+
+def passage(number, text):
+    return {"title": f"Artikel {number}", "date": datetime(2025, 9, number), "url": f"https://example.com/{number}", "text": text}
+
+def prompt_tokens(prompt):
+    return count_tokens(SYSTEM_PROMPT) + count_tokens(prompt)
+
+@pytest.mark.parametrize("budget", [120, 150, 200, 300, 1000])
+def test_the_prompt_never_exceeds_the_budget(budget):
+    passages = [passage(number, "\n\n".join(PARAGRAPHS[number % 3:] + PARAGRAPHS[:number % 3])) for number in range(1, 8)]
+
+    prompt, tokens, included = pack_context(QUESTION, passages, budget)
+
+    assert tokens == prompt_tokens(prompt)
+    assert tokens <= budget
+    assert len(included) <= len(passages)
+
+def test_an_oversized_first_passage_is_dropped():
+    passages = [passage(1, "Undav " * 2000), passage(2, PARAGRAPHS[0])]
+
+    prompt, tokens, included = pack_context(QUESTION, passages, 300)
+
+    assert tokens <= 300
+    assert [source["url"] for source in included] == ["https://example.com/2"]
+    assert prompt.count("[1] Artikel 2") == 1
+
+def test_paragraphs_are_included_once():
+    passages = [passage(1, "\n\n".join(PARAGRAPHS)), passage(2, PARAGRAPHS[0] + "\n\n" + PARAGRAPHS[1])]
+
+    prompt, _, included = pack_context(QUESTION, passages, 1000)
+
+    assert prompt.count(PARAGRAPHS[0]) == 1
+    # Nothing of the second passage is left, so it is not numbered either
+    assert len(included) == 1
+
+class FakeEmbeddings:
+    async def aembed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+@contextlib.asynccontextmanager
+async def fake_session():
+    yield None
+
+def test_answers_are_streamed_with_timings(monkeypatch):
+    async def search(db, embedding, limit):
+        await asyncio.sleep(0.05)
+        return [{
+            "title": "Artikel 1",
+            "date": datetime(2025, 9, 1),
+            "url": "https://example.com/1",
+            "chunks": [{"chunk_index": 0, "content": PARAGRAPHS[0]}],
+        }]
+
+    monkeypatch.setattr(answer, "AsyncSessionLocal", fake_session)
+    monkeypatch.setattr(answer, "search_similar_chunks_async", search)
+    tokens = []
+
+    stats = asyncio.run(answer_question(
+        QUESTION, tokens.append, llm=StubLLM(delay=0.01), embeddings=FakeEmbeddings()
+    ))
+
+    assert len(tokens) > 1
+    assert "".join(tokens).startswith("Der VfB Stuttgart hat gegen Werder Bremen")
+    assert stats["retrieval"] >= 0.05
+    assert stats["retrieval"] < stats["ttft"] < stats["total"]
+    assert stats["total"] - stats["ttft"] >= 0.01 * (len(tokens) - 1)
+    assert stats["context_tokens"] <= answer.CONTEXT_TOKENS
+    assert stats["sources"] == [("Artikel 1", "https://example.com/1")]
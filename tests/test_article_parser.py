@@ -0,0 +1,52 @@
+from datetime import datetime
+import pytest
+from article_parser import BACKENDS, parse_article, parse_article_date
+
+@pytest.mark.parametrize("text,expected", [
+    ("Club, 14. April 2025", datetime(2025, 4, 14)),
+    ("Profis, 3. März 2025", datetime(2025, 3, 3)),
+    ("Profis, 1. Mai 2024", datetime(2024, 5, 1)),
+    ("Frauen, 24. Dezember 2023", datetime(2023, 12, 24)),
+    ("Nachwuchs, 7. Oktober 2025", datetime(2025, 10, 7)),
+    ("31. Juli 2025", datetime(2025, 7, 31)),
+    ("Club, 14.04.2025", datetime(2025, 4, 14)),
+])
+def test_parse_article_date(text, expected):
+    assert parse_article_date(text) == expected
+
+@pytest.mark.parametrize("text", ["", "Club", "Club, 14. Brumaire 2025", "Club, 31. Februar 2025"])
+def test_parse_article_date_rejects_invalid_dates(text):
+    with pytest.raises(ValueError):
+        parse_article_date(text)
+
+ARTICLE_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <link rel="stylesheet" href="/styles.css">
+  <link rel="canonical" href="https://www.vfb.de/de/aktuell/neues/profis/2025/sieg/">
+  <meta name="description" content=" Der VfB gewinnt. ">
+</head>
+<body>
+  <div class="teaser"><h1>Seitentitel</h1></div>
+  <div class="content">
+    <div class="teaser"><h1>Der VfB gewinnt</h1></div>
+    <span class="date">Profis, 3. März 2025</span>
+    <div class="directories"><a href="/profis">Profis</a><a href="/club">Club</a></div>
+    <div class="image"><img src="/bild.jpg"></div>
+    <p>Vorspann.</p>
+    <div class="meldung-bild"><p>Erster Absatz.</p><p> </p><p>Zweiter Absatz.</p></div>
+  </div>
+  <div class="content"><p>Nicht Teil des Artikels.</p></div>
+</body>
+</html>"""
+
+def test_parse_article_is_the_same_with_every_backend():
+    results = {backend: parse_article(ARTICLE_PAGE, backend) for backend in BACKENDS}
+
+    expected = results["lxml"]
+    assert expected["canonical_url"] == "https://www.vfb.de/de/aktuell/neues/profis/2025/sieg/"
+    assert expected["content_title"] == "Der VfB gewinnt"
+    assert expected["date"] == "Profis, 3. März 2025"
+    assert expected["body_paragraphs"] == ["Erster Absatz.", "Zweiter Absatz."]
+    for backend, result in results.items():
+        assert result == expected, backend
@@ -0,0 +1,186 @@
+import os
+import hashlib
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from embedding_model import content_hash, CONTENT_HASH_SQL
+from models.database import to_pgvector
+from models.embedding_backfill import EmbeddingBackfill
+from backfill_embeddings import (
+    STALE_ROWS_QUERY, load_checkpoint, backfill_articles, backfill_chunks, swap_embeddings
+)
+
+# The database tests need a PostgreSQL database migrated with
+# `alembic upgrade head`. They start from empty tables and roll everything
+# back at the end.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+needs_database = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+OLD = "old-model:1536"
+TARGET = "new-model:1536"
+
+def test_content_hash_covers_content_and_summary():
+    assert content_hash("Inhalt", "Zusammenfassung") == hashlib.sha256("Inhalt\nZusammenfassung".encode("utf-8")).hexdigest()
+    assert content_hash("Inhalt", "Zusammenfassung") != content_hash("Inhalt!", "Zusammenfassung")
+    assert content_hash("Inhalt", "Zusammenfassung") != content_hash("Inhalt", "Zusammenfassung!")
+
+class FakeSession:
+    """Session holding checkpoints in a dict."""
+
+    def __init__(self):
+        self.rows = {}
+        self.commits = 0
+
+    def get(self, model, key):
+        return self.rows.get(key)
+
+    def add(self, row):
+        self.rows[row.target_version] = row
+
+    def commit(self):
+        self.commits += 1
+
+def test_a_new_backfill_starts_at_the_first_article():
+    db = FakeSession()
+
+    checkpoint = load_checkpoint(db, TARGET)
+
+    assert (checkpoint.last_id, checkpoint.rows_embedded, checkpoint.finished_at) == (0, 0, None)
+    assert db.rows[TARGET] is checkpoint
+    assert db.commits == 1
+
+def test_an_interrupted_backfill_resumes_after_its_last_article():
+    db = FakeSession()
+    checkpoint = load_checkpoint(db, TARGET)
+    checkpoint.last_id, checkpoint.rows_embedded = 42, 32
+
+    assert (load_checkpoint(db, TARGET).last_id, load_checkpoint(db, TARGET).rows_embedded) == (42, 32)
+
+def test_a_finished_backfill_starts_a_new_pass():
+    db = FakeSession()
+    checkpoint = load_checkpoint(db, TARGET)
+    checkpoint.last_id, checkpoint.rows_embedded, checkpoint.finished_at = 42, 32, datetime(2025, 1, 1)
+
+    checkpoint = load_checkpoint(db, TARGET)
+
+    assert (checkpoint.last_id, checkpoint.rows_embedded, checkpoint.finished_at) == (0, 0, None)
+
+class FakeEmbeddings:
+    """Embeddings failing once after the given number of requests."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.texts = []
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and len(self.texts) >= self.fail_after:
+            self.fail_after = None
+            raise RuntimeError("rate limited")
+        self.texts.append(texts)
+        return [[1.0] + [0.0] * 1535 for _ in texts]
+
+@pytest.fixture
+def db():
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # Commits of the backfill only release savepoints
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+            session.execute(text("DELETE FROM embedding_backfills"))
+            session.execute(text("DELETE FROM article_chunks"))
+            session.execute(text("DELETE FROM blog_articles"))
+            yield session
+        transaction.rollback()
+    engine.dispose()
+
+def insert_article(db, number, version=OLD, embedded=True, changed=False):
+    vector = to_pgvector([0.0, 1.0] + [0.0] * 1534) if embedded else None
+    content = f"Inhalt {number}"
+    return db.execute(text("""
+        INSERT INTO blog_articles (title, url, date, content, summary, content_embedding, summary_embedding,
+                                   embedding_version, content_hash)
+        VALUES ('Test', :url, :date, :content, 'Zusammenfassung', CAST(:vector AS vector), CAST(:vector AS vector),
+                :version, :hash)
+        RETURNING id
+    """), {
+        "url": f"https://example.com/{number}",
+        "date": datetime(2025, 9, 1),
+        "content": content,
+        "vector": vector,
+        "version": version if embedded else None,
+        "hash": content_hash(content + (" (alt)" if changed else ""), "Zusammenfassung"),
+    }).scalar()
+
+def stale_ids(db):
+    return [row.id for row in db.execute(STALE_ROWS_QUERY, {"last_id": 0, "target": TARGET, "batch_size": 100})]
+
+@needs_database
+def test_the_content_hash_matches_the_sql_expression(db):
+    article_id = insert_article(db, 1)
+    content, summary, sql_hash = db.execute(
+        text(f"SELECT content, summary, {CONTENT_HASH_SQL} FROM blog_articles WHERE id = :id"), {"id": article_id}
+    ).one()
+
+    assert sql_hash == content_hash(content, summary)
+
+@needs_database
+def test_stale_rows_are_other_versions_and_changed_contents(db):
+    old = insert_article(db, 1)
+    changed = insert_article(db, 2, version=TARGET, changed=True)
+    insert_article(db, 3, version=TARGET)
+    insert_article(db, 4, embedded=False)
+
+    assert stale_ids(db) == [old, changed]
+
+@needs_database
+def test_articles_with_up_to_date_shadow_columns_are_not_selected_again(db):
+    insert_article(db, 1)
+
+    backfill_articles(db, FakeEmbeddings(), TARGET, rows_per_minute=10 ** 6)
+
+    assert stale_ids(db) == []
+
+@needs_database
+def test_an_interrupted_backfill_resumes_from_its_checkpoint(db):
+    ids = [insert_article(db, number) for number in range(5)]
+
+    with pytest.raises(RuntimeError):
+        backfill_articles(db, FakeEmbeddings(fail_after=1), TARGET, batch_size=2, rows_per_minute=10 ** 6)
+    db.rollback()
+    checkpoint = db.get(EmbeddingBackfill, TARGET)
+    assert (checkpoint.last_id, checkpoint.rows_embedded) == (ids[1], 2)
+
+    embeddings = FakeEmbeddings()
+    backfill_articles(db, embeddings, TARGET, batch_size=2, rows_per_minute=10 ** 6)
+
+    # Only the articles after the checkpoint are embedded again
+    assert [texts[:len(texts) // 2] for texts in embeddings.texts] == [["Inhalt 2", "Inhalt 3"], ["Inhalt 4"]]
+    assert db.get(EmbeddingBackfill, TARGET).rows_embedded == 5
+
+@needs_database
+def test_the_swap_replaces_articles_and_chunks_at_once(db):
+    article_id = insert_article(db, 1)
+    db.execute(text("""
+        INSERT INTO article_chunks (article_id, chunk_index, content, token_count, embedding, embedding_version)
+        VALUES (:id, 0, 'Inhalt 1', 3, CAST(:vector AS vector), :version)
+    """), {"id": article_id, "vector": to_pgvector([0.0, 1.0] + [0.0] * 1534), "version": OLD})
+    embeddings = FakeEmbeddings()
+    backfill_articles(db, embeddings, TARGET, rows_per_minute=10 ** 6)
+    backfill_chunks(db, embeddings, TARGET, chunks_per_minute=10 ** 6)
+
+    swap_embeddings(db, TARGET)
+
+    article = db.execute(text("""
+        SELECT embedding_version, content_embedding::text AS embedding, content_embedding_next, embedding_version_next
+        FROM blog_articles WHERE id = :id
+    """), {"id": article_id}).one()
+    assert article.embedding_version == TARGET
+    assert article.embedding.startswith("[1,0,")
+    assert (article.content_embedding_next, article.embedding_version_next) == (None, None)
+    chunk = db.execute(text(
+        "SELECT embedding_version, embedding_next FROM article_chunks WHERE article_id = :id"
+    ), {"id": article_id}).one()
+    assert (chunk.embedding_version, chunk.embedding_next) == (TARGET, None)
+    assert db.get(EmbeddingBackfill, TARGET).finished_at is not None
@@ -0,0 +1,20 @@
+import pytest
+from chunking import chunk_text, count_tokens
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(20, 5), (50, 10), (400, 60)])
+def test_chunks_of_short_paragraphs_stay_within_budget(max_tokens, overlap_tokens):
+    content = "\n\n".join(f"Tor durch Undav in der {minute}. Minute." for minute in range(1, 300))
+
+    chunks = chunk_text(content, max_tokens, overlap_tokens)
+
+    assert len(chunks) > 1
+    for chunk, tokens in chunks:
+        assert tokens == count_tokens(chunk)
+        assert count_tokens(chunk) <= max_tokens
+
+def test_chunks_keep_all_paragraphs():
+    paragraphs = [f"Absatz {i}." for i in range(100)]
+
+    chunks = chunk_text("\n\n".join(paragraphs), 30, 0)
+
+    assert [p for chunk, _ in chunks for p in chunk.split("\n\n")] == paragraphs
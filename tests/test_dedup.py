@@ -0,0 +1,81 @@
+import random
+import pytest
+from dedup import DuplicateIndex, minhash, similarity, band_buckets, shingles, BANDS, MIN_WORDS
+
+WORDS = (
+    "der vfb stuttgart gewinnt gegen werder bremen mit zwei zu eins undav trifft doppelt "
+    "hoeneß lobt die mannschaft nach dem spiel in der arena vor ausverkauftem haus am samstag "
+    "abend kapitän karazor verlängert seinen vertrag bis zum sommer des nächsten jahres"
+).split()
+
+def article(seed, length=120):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+def edited(text, changes, seed=0):
+    """Replace a few words of a text."""
+    rng = random.Random(seed)
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "geändert"
+    return " ".join(words)
+
+@pytest.fixture
+def index(tmp_path):
+    with DuplicateIndex(str(tmp_path / "dedup.sqlite")) as index:
+        yield index
+
+def test_short_texts_get_no_signature():
+    assert shingles("") == set()
+    assert minhash("") is None
+    assert minhash(" ".join(WORDS[:MIN_WORDS - 1])) is None
+    assert minhash(" ".join(WORDS[:MIN_WORDS])) is not None
+
+def test_short_articles_are_not_clustered(index):
+    assert index.check("https://example.com/1", "") == (None, None)
+    assert index.check("https://example.com/2", "Zum Video") == (None, None)
+    assert index.check("https://example.com/3", "") == (None, None)
+
+def test_similarity_estimates_the_jaccard_similarity():
+    text = article(1)
+    assert similarity(minhash(text), minhash(text)) == 1.0
+    assert similarity(minhash(text), minhash(edited(text, 2))) > 0.8
+    assert similarity(minhash(text), minhash(article(2))) < 0.3
+
+def test_similar_signatures_share_lsh_buckets():
+    text = article(1)
+    buckets = band_buckets(minhash(text))
+
+    assert len(buckets) == BANDS
+    assert set(buckets) & set(band_buckets(minhash(edited(text, 2))))
+    assert not set(buckets) & set(band_buckets(minhash(article(2))))
+
+def test_near_duplicates_join_the_cluster_of_the_original(index):
+    text = article(1)
+    cluster_id, duplicate_of = index.check("https://example.com/1", text)
+
+    assert duplicate_of is None
+    assert index.check("https://example.com/2", edited(text, 2)) == (cluster_id, "https://example.com/1")
+    assert index.check("https://example.com/3", article(2))[1] is None
+
+def test_only_saved_articles_are_kept(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    with DuplicateIndex(path) as index:
+        index.check("https://example.com/1", article(1))
+        index.check("https://example.com/2", article(2))
+        index.save(["https://example.com/1"])
+        index.discard(["https://example.com/2"])
+
+    with DuplicateIndex(path) as index:
+        assert index.check("https://example.com/3", edited(article(1), 2))[1] == "https://example.com/1"
+        assert index.check("https://example.com/4", edited(article(2), 2))[1] is None
+
+def test_an_original_that_failed_to_load_stays_the_original(index):
+    text = article(1)
+    cluster_id, _ = index.check("https://example.com/1", text)
+    index.check("https://example.com/2", edited(text, 2))
+    # The original fails to load, its duplicate is loaded without embeddings
+    index.discard(["https://example.com/1"])
+    index.save(["https://example.com/2"])
+
+    assert index.check("https://example.com/1", text) == (cluster_id, None)
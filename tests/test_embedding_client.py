@@ -0,0 +1,69 @@
+import math
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from embedding_client import RateLimitedEmbeddings
+from mock_embedding_server import MockProvider, make_handler
+from rate_limit import RateLimitScheduler
+
+class FlakyProvider(MockProvider):
+    """Mock provider failing its first requests with a server error."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def handle(self, body):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                self.stats["errors"] += 1
+                return 500, {}, {"error": {"message": "Mock server error", "type": "server_error"}}
+        return super().handle(body)
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(provider):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(provider))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def make_client(base_url, scheduler):
+    return RateLimitedEmbeddings("mock", api_key="test", base_url=base_url, scheduler=scheduler, max_retries=4)
+
+def test_server_errors_are_retried(serve):
+    provider = FlakyProvider(2, latency=0)
+    scheduler = RateLimitScheduler(rpm=10000, tpm=10000000, interactive_reserve=0)
+    client = make_client(serve(provider), scheduler)
+
+    vectors = client.embed_documents(["Undav trifft", "Der VfB gewinnt"])
+
+    assert provider.stats["errors"] == 2
+    assert provider.stats["served"] == 1
+    # The openai client requests base64, i.e. float32 vectors
+    assert vectors[0] == pytest.approx(provider.embed("Undav trifft"), abs=1e-6)
+    assert vectors[1] == pytest.approx(provider.embed("Der VfB gewinnt"), abs=1e-6)
+
+def test_rate_limited_requests_wait_for_the_reset(serve):
+    provider = MockProvider(rpm=6000, tpm=600, latency=0)
+    # The provider's token quota is used up, it refills at 10 tokens per second
+    provider.tokens.level = 0
+    scheduler = RateLimitScheduler(rpm=10000, tpm=10000000, interactive_reserve=0)
+    client = make_client(serve(provider), scheduler)
+
+    vector = client.embed_query("Wer hat gestern getroffen?")
+
+    assert provider.stats["rate_limited"] >= 1
+    assert provider.stats["served"] == 1
+    assert scheduler.blocked_until > 0
+    # The limits reported in the headers replace the configured ones
+    assert scheduler.tokens.capacity == 600
+    assert math.isclose(sum(value * value for value in vector), 1.0, rel_tol=1e-6)
@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from partitions import ensure_season_partition, partition_name, DEFAULT_PARTITION
+
+# Needs a PostgreSQL database migrated with `alembic upgrade head`. Everything
+# is rolled back at the end.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+# A season far in the future, which has no partition yet
+SEASON = 2090
+
+@pytest.fixture
+def db():
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        with Session(bind=connection) as session:
+            yield session
+        transaction.rollback()
+    engine.dispose()
+
+def insert_article(db, day):
+    article_id = db.execute(text("""
+        INSERT INTO blog_articles (title, url, date, content, summary)
+        VALUES ('Test', :url, :date, 'Inhalt', 'Zusammenfassung')
+        RETURNING id
+    """), {"url": f"https://example.com/test-{day:%Y%m%d}", "date": day}).scalar()
+    db.execute(text("""
+        INSERT INTO article_chunks (article_id, chunk_index, content, token_count)
+        VALUES (:article_id, 0, 'Inhalt', 2)
+    """), {"article_id": article_id})
+    return article_id
+
+def count_chunks(db, article_id):
+    return db.execute(text("SELECT count(*) FROM article_chunks WHERE article_id = :id"), {"id": article_id}).scalar()
+
+def test_chunks_survive_moving_articles_out_of_the_default_partition(db):
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+    assert db.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE id = :id"), {"id": article_id}).scalar() == 1
+
+    assert ensure_season_partition(db, SEASON)
+
+    assert db.execute(text(f"SELECT count(*) FROM {partition_name(SEASON)} WHERE id = :id"), {"id": article_id}).scalar() == 1
+    assert count_chunks(db, article_id) == 1
+
+def test_chunks_survive_moving_articles_to_another_season(db):
+    ensure_season_partition(db, SEASON)
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    db.execute(text("UPDATE blog_articles SET date = :date WHERE id = :id"), {"date": datetime(SEASON + 5, 9, 1), "id": article_id})
+
+    assert count_chunks(db, article_id) == 1
+
+def test_deleting_an_article_deletes_its_chunks(db):
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    db.execute(text("DELETE FROM blog_articles WHERE id = :id"), {"id": article_id})
+
+    assert count_chunks(db, article_id) == 0
+
+def test_chunks_follow_the_date_of_their_article(db):
+    ensure_season_partition(db, SEASON)
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    db.execute(text("UPDATE blog_articles SET date = :date WHERE id = :id"), {"date": datetime(SEASON, 10, 1), "id": article_id})
+
+    assert db.execute(
+        text("SELECT article_date FROM article_chunks WHERE article_id = :id"), {"id": article_id}
+    ).scalar() == datetime(SEASON, 10, 1)
+
+def url_entry(db, article_id):
+    return db.execute(text("SELECT date FROM article_urls WHERE article_id = :id"), {"id": article_id}).scalar()
+
+def test_a_url_cannot_be_loaded_under_another_date(db):
+    insert_article(db, datetime(SEASON, 9, 1))
+
+    with pytest.raises(IntegrityError):
+        db.execute(text("""
+            INSERT INTO blog_articles (title, url, date, content, summary)
+            VALUES ('Test', :url, :date, 'Inhalt', 'Zusammenfassung')
+        """), {"url": f"https://example.com/test-{SEASON}0901", "date": datetime(SEASON + 5, 9, 1)})
+
+def test_moving_an_article_keeps_its_url(db):
+    ensure_season_partition(db, SEASON)
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    db.execute(text("UPDATE blog_articles SET date = :date WHERE id = :id"), {"date": datetime(SEASON + 5, 9, 1), "id": article_id})
+
+    assert url_entry(db, article_id) == datetime(SEASON + 5, 9, 1)
+
+def test_urls_survive_moving_articles_out_of_the_default_partition(db):
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    ensure_season_partition(db, SEASON)
+
+    assert url_entry(db, article_id) == datetime(SEASON, 9, 1)
+
+def test_deleting_an_article_frees_its_url(db):
+    article_id = insert_article(db, datetime(SEASON, 9, 1))
+
+    db.execute(text("DELETE FROM blog_articles WHERE id = :id"), {"id": article_id})
+
+    assert url_entry(db, article_id) is None
@@ -0,0 +1,59 @@
+import os
+import time
+import uuid
+import pytest
+from rate_limit import RateLimitScheduler, SharedQuota, INTERACTIVE, BULK
+
+def test_reported_remaining_tokens_are_not_charged_twice():
+    scheduler = RateLimitScheduler(rpm=100, tpm=1000, interactive_reserve=0)
+    scheduler.acquire(100, BULK)
+
+    # The provider counted 150 tokens, which its remaining tokens already include
+    scheduler.update({"x-ratelimit-remaining-tokens": "850"}, estimated_tokens=100, used_tokens=150)
+
+    assert 849 <= scheduler.tokens.level <= 851
+
+def test_used_tokens_are_charged_without_headers():
+    scheduler = RateLimitScheduler(rpm=100, tpm=1000, interactive_reserve=0)
+    scheduler.acquire(100, BULK)
+
+    scheduler.update({}, estimated_tokens=100, used_tokens=150)
+
+    assert 849 <= scheduler.tokens.level <= 851
+
+def test_bulk_uses_the_reserve_without_searches():
+    scheduler = RateLimitScheduler(rpm=100, tpm=1000, interactive_reserve=0.1)
+
+    started = time.monotonic()
+    scheduler.acquire(1000, BULK)
+
+    assert time.monotonic() - started < 0.5
+
+def test_bulk_leaves_the_reserve_after_a_search():
+    scheduler = RateLimitScheduler(rpm=100, tpm=1000, interactive_reserve=0.1)
+    scheduler.acquire(1, INTERACTIVE)
+
+    now = time.monotonic()
+    reserve = scheduler.interactive_reserve
+    assert scheduler.tokens.wait_time(999, now, reserve) > 0
+    assert now - scheduler.last_interactive < 60
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_processes_share_the_quota_and_the_interactive_reserve():
+    name = f"test-{uuid.uuid4()}"
+    # Stand-ins for a search process and a bulk process
+    search = SharedQuota(os.environ["TEST_DATABASE_URL"], name)
+    bulk = SharedQuota(os.environ["TEST_DATABASE_URL"], name)
+    try:
+        assert bulk.take(950, BULK, 100, 1000, 0.1) == 0
+        # Nearly all of the quota is used up by the other process
+        assert search.take(100, INTERACTIVE, 100, 1000, 0.1) > 0
+        assert search.take(50, INTERACTIVE, 100, 1000, 0.1) == 0
+        # After the search, bulk requests leave the reserve free
+        assert bulk.take(1, BULK, 100, 1000, 0.1) > 0
+    finally:
+        with search._cursor() as cur:
+            cur.execute("DELETE FROM embedding_quota WHERE name = %s", (name,))
+        search.connection.commit()
+        search.close()
+        bulk.close()
@@ -0,0 +1,115 @@
+import os
+import time
+import numpy as np
+import psycopg2
+import pytest
+from search_cache import SemanticCache, SharedResultCache, ArticleChangeListener, CHANGES_CHANNEL
+
+class FakeListener:
+    """Change listener reporting a change whenever one is signalled."""
+
+    def __init__(self):
+        self.pending = False
+
+    def changed(self):
+        changed, self.pending = self.pending, False
+        return changed
+
+    def close(self):
+        pass
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return list(vector / np.linalg.norm(vector))
+
+def rotated(similarity):
+    """A unit vector with the given cosine similarity to (1, 0, 0)."""
+    return unit(similarity, np.sqrt(1 - similarity ** 2), 0)
+
+def make_cache(**kwargs):
+    return SemanticCache(**{"threshold": 0.9, "size": 10, "ttl": 60, "listener": FakeListener(), **kwargs})
+
+def test_queries_above_the_threshold_hit():
+    cache = make_cache()
+    cache.store(unit(1, 0, 0), 3, ["a", "b", "c"])
+
+    assert cache.lookup(rotated(0.95), 3) == ["a", "b", "c"]
+    assert cache.lookup(rotated(0.85), 3) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_results_serve_smaller_limits_and_the_same_mode_only():
+    cache = make_cache()
+    cache.store(unit(1, 0, 0), 3, ["a", "b", "c"], mode="articles")
+
+    assert cache.lookup(unit(1, 0, 0), 2, mode="articles") == ["a", "b"]
+    assert cache.lookup(unit(1, 0, 0), 5, mode="articles") is None
+    assert cache.lookup(unit(1, 0, 0), 2, mode="chunks") is None
+
+def test_entries_expire_after_the_ttl():
+    cache = make_cache(ttl=0.05)
+    cache.store(unit(1, 0, 0), 1, ["a"])
+
+    assert cache.lookup(unit(1, 0, 0), 1) == ["a"]
+    time.sleep(0.1)
+    assert cache.lookup(unit(1, 0, 0), 1) is None
+
+def test_the_least_recently_used_entry_is_replaced():
+    cache = make_cache(size=2)
+    cache.store(unit(1, 0, 0), 1, ["x"])
+    cache.store(unit(0, 1, 0), 1, ["y"])
+    # Using x makes y the least recently used entry
+    assert cache.lookup(unit(1, 0, 0), 1) == ["x"]
+
+    cache.store(unit(0, 0, 1), 1, ["z"])
+
+    assert cache.lookup(unit(1, 0, 0), 1) == ["x"]
+    assert cache.lookup(unit(0, 1, 0), 1) is None
+    assert cache.lookup(unit(0, 0, 1), 1) == ["z"]
+
+def test_changes_clear_the_cache():
+    listener = FakeListener()
+    cache = make_cache(listener=listener)
+    cache.store(unit(1, 0, 0), 1, ["a"])
+
+    listener.pending = True
+
+    assert cache.lookup(unit(1, 0, 0), 1) is None
+    assert cache.entries == []
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_notify_clears_the_cache():
+    listener = ArticleChangeListener(os.environ["TEST_DATABASE_URL"])
+    cache = make_cache(listener=listener)
+    try:
+        # The first lookup connects the listener
+        assert cache.lookup(unit(1, 0, 0), 1) is None
+        cache.store(unit(1, 0, 0), 1, ["a"])
+        assert cache.lookup(unit(1, 0, 0), 1) == ["a"]
+
+        connection = psycopg2.connect(listener.dsn)
+        connection.autocommit = True
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, 'blog_articles')", (CHANGES_CHANNEL,))
+        connection.close()
+        time.sleep(0.2)
+
+        assert cache.lookup(unit(1, 0, 0), 1) is None
+    finally:
+        cache.close()
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_processes_share_results():
+    mode = f"test-{time.time()}"
+    first = make_cache(shared=SharedResultCache(os.environ["TEST_DATABASE_URL"]))
+    second = make_cache(shared=SharedResultCache(os.environ["TEST_DATABASE_URL"]))
+    try:
+        first.store([1.0] * 1536, 1, [{"title": "Sieg", "url": "https://example.com"}], mode)
+
+        results = second.lookup([1.0] * 1535 + [0.9], 1, mode)
+
+        assert results[0].title == "Sieg"
+    finally:
+        with first.shared._cursor() as cur:
+            cur.execute("DELETE FROM search_cache WHERE mode = %s", (mode,))
+        first.close()
+        second.close()